@@ -0,0 +1,106 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import os
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+""""
+========================== Artifact Sink =========================
+"""
+
+# class to write the intermediate tables of a run (rawDataConcatenated.csv, filteredData.xlsx, global_statistics_summary.csv) and print the overviews.
+# mode = 'sync' writes immediately (as before), 'background' writes on one writer thread (in order) so the pipeline does not wait for the disk,
+# 'disabled' writes and prints nothing.
+# format overrides the file type given by the name, e.g. 'parquet' or 'feather' are much faster than Excel. Either one format for all artifacts,
+# or a dict per artifact name without extension, e.g. {'filteredData': 'parquet'}. Supported are csv, xlsx, parquet, feather and pickle.
+class ArtifactSink:
+    extensions = {'csv': '.csv', 'xlsx': '.xlsx', 'parquet': '.parquet', 'feather': '.feather', 'pickle': '.pkl'}
+
+    def __init__(self, mode = 'sync', format = None, outputDir = '', verbose = True):
+        if mode not in ['sync', 'background', 'disabled']:
+            raise ValueError("mode should be 'sync', 'background' or 'disabled', not {}".format(mode))
+        self.mode = mode
+        self.format = format
+        self.outputDir = outputDir
+        #verbose = False only suppresses the overviews that are printed, not the files
+        self.verbose = verbose
+        self.writer = None
+        self.pending = []
+        if mode == 'background':
+            self.writer = ThreadPoolExecutor(max_workers = 1)
+            #make sure everything is on disk before the interpreter exits
+            atexit.register(self.flush)
+
+    #file format and path an artifact ends up in
+    def resolve(self, name):
+        stem, extension = os.path.splitext(name)
+        fmt = self.format.get(stem) if isinstance(self.format, dict) else self.format
+        if fmt is None:
+            fmt = 'pickle' if extension == '.pkl' else extension.lstrip('.')
+        if fmt not in self.extensions:
+            raise ValueError('Unsupported artifact format {}'.format(fmt))
+        return fmt, os.path.join(self.outputDir, stem + self.extensions[fmt])
+
+    #only csv files can be appended to. For other formats, the caller writes the full table instead.
+    def appendable(self, name):
+        return self.resolve(name)[0] == 'csv'
+
+    def write(self, frame, name, index = True, append = False):
+        if self.mode == 'disabled':
+            return
+        fmt, path = self.resolve(name)
+        if self.mode == 'background':
+            #copy, since the caller may keep changing the frame while it is being written
+            self.pending.append(self.writer.submit(self.write_now, frame.copy(), fmt, path, index, append))
+        else:
+            self.write_now(frame, fmt, path, index, append)
+
+    def write_now(self, frame, fmt, path, index, append):
+        if fmt == 'csv':
+            frame.to_csv(path, index = index, mode = 'a' if append else 'w', header = not append)
+        elif fmt == 'xlsx':
+            frame.to_excel(path, index = index)
+        elif fmt == 'parquet':
+            frame.to_parquet(path, index = index)
+        elif fmt == 'feather':
+            #feather cannot store an index, so it is kept as a column if requested
+            (frame.reset_index() if index else frame.reset_index(drop = True)).to_feather(path)
+        else:
+            frame.to_pickle(path)
+
+    #print overviews. Callables (e.g. data.info) are only evaluated if the sink is verbose, so no time is spent on them otherwise.
+    def log(self, *items):
+        if self.mode == 'disabled' or not self.verbose:
+            return
+        for item in items:
+            output = item() if callable(item) else item
+            if output is not None:
+                print(output)
+
+    #wait for all background writes. Raises the error of a failed write here, instead of losing it on the writer thread.
+    def flush(self):
+        pending, self.pending = self.pending, []
+        for future in pending:
+            future.result()
@@ -0,0 +1,118 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import pandas as pd
+
+""""
+========================== Car Stats =========================
+"""
+
+# class to hold the statistics per car, indexed by card_id.
+# Columns are added in blocks (e.g. the energy stats, the start time percentiles), each block a frame of per car columns that is stored as is.
+# Every addition is checked against the card IDs of the container, so columns of different cars can never end up in the same row.
+# frame() gives the familiar carStats table (card_id column plus all columns), join() adds columns to session data with an index join on card_id.
+class CarStats:
+    def __init__(self, cardIDs):
+        self.index = pd.Index(cardIDs, name = 'card_id')
+        if self.index.has_duplicates:
+            raise ValueError('CarStats needs unique card IDs')
+        #block name -> frame indexed by card_id
+        self.blocks = {}
+        #column name -> block name
+        self.columnBlocks = {}
+        #frame() is cached until the next addition
+        self.table = None
+
+    #container with the columns of a carStats table, e.g. one read back from allCarStats.xlsx
+    @classmethod
+    def from_frame(cls, frame, block = 'carStats'):
+        carStats = cls(frame['card_id'])
+        carStats.add(block, frame.drop(columns = 'card_id'), cardIDs = frame['card_id'])
+        return carStats
+
+    #columns (frame, dict or series) with one row per car. cardIDs holds the card ID of every row: rows are reordered to the order of the container,
+    #and a ValueError is raised if they are not exactly the cars of the container. Without cardIDs, the rows must already be in the order of the container.
+    def align(self, columns, cardIDs = None):
+        frame = columns.to_frame() if isinstance(columns, pd.Series) else pd.DataFrame(columns)
+        if len(frame) != len(self.index):
+            raise ValueError('Expected {} rows, one per car, got {}'.format(len(self.index), len(frame)))
+        if cardIDs is None:
+            return frame.set_axis(self.index)
+        cardIDs = self.check(cardIDs)
+        if cardIDs.equals(self.index):
+            return frame.set_axis(self.index)
+        return frame.set_axis(cardIDs).reindex(self.index)
+
+    #raises a ValueError if cardIDs are not exactly the cars of the container, in any order
+    def check(self, cardIDs):
+        cardIDs = pd.Index(cardIDs, name = 'card_id')
+        if len(cardIDs) != len(self.index) or cardIDs.has_duplicates or not self.index.isin(cardIDs).all():
+            raise ValueError('The card IDs differ from those of carStats. Were the stats computed on different data?')
+        return cardIDs
+
+    #add columns to a block, in place. Columns that exist already are replaced, unless replace = False, in which case they are kept as they are.
+    def add(self, block, columns, cardIDs = None, replace = True):
+        frame = self.align(columns, cardIDs)
+        existing = [name for name in frame.columns if name in self.columnBlocks]
+        if not replace:
+            frame = frame.drop(columns = existing)
+        else:
+            for name in existing:
+                self.blocks[self.columnBlocks[name]] = self.blocks[self.columnBlocks[name]].drop(columns = name)
+        if block in self.blocks:
+            frame = pd.concat([self.blocks[block], frame], axis = 1)
+        self.blocks[block] = frame
+        self.columnBlocks.update((name, block) for name in frame.columns)
+        self.table = None
+        return self
+
+    #all columns as one frame indexed by card_id
+    def indexed(self):
+        if not self.blocks:
+            return pd.DataFrame(index = self.index)
+        return pd.concat(list(self.blocks.values()), axis = 1)
+
+    #carStats table: card_id column, then all columns in the order they were added. One row per car.
+    def frame(self):
+        if self.table is None:
+            self.table = self.indexed().reset_index()
+        return self.table
+
+    #sessions with the columns of their car added (all columns if columns is None). Sessions of unknown cars get NaN.
+    def join(self, sessions, columns = None):
+        table = self.indexed() if columns is None else self.indexed()[list(columns)]
+        return sessions.join(table, on = 'card_id')
+
+    @property
+    def columns(self):
+        return self.frame().columns
+
+    def __getitem__(self, name):
+        return self.frame()[name]
+
+    def __contains__(self, name):
+        return name == 'card_id' or name in self.columnBlocks
+
+    def __len__(self):
+        return len(self.index)
@@ -0,0 +1,82 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+import os
+import pandas as pd
+from csv_backend import map_categories
+
+""""
+========================== Card ID Reconciliation =========================
+"""
+
+# class to correct faulty user IDs. Backend sometimes drops last digit of ID.
+# till Oct 2022 manually checked that those are likely the same IDs based on non-overlapping times and energy consumption.
+# Works on the unique IDs only: every ID is looked up in a hash index of all known IDs with its last digit dropped.
+# The resulting mapping (truncated ID -> full ID) is applied in one vectorized remap and can be saved to csv for auditing and reuse in later runs.
+class CardIdReconciliation:
+    #load = False starts from an empty mapping, also if mappingFile exists. The mapping is then only saved to mappingFile, e.g. for auditing.
+    def __init__(self, mappingFile = None, load = True):
+        self.mappingFile = mappingFile
+        self.mapping = {}
+        if load and mappingFile is not None and os.path.isfile(mappingFile):
+            table = pd.read_csv(mappingFile, dtype = str)
+            self.mapping = dict(zip(table['truncated_id'], table['card_id']))
+
+    #extend the mapping with all truncated IDs found among cardIDs. Returns the updated mapping.
+    def build(self, cardIDs):
+        ids = pd.Series(pd.unique(cardIDs)).astype(str)
+        #hash index of all IDs we know of, including those of earlier runs
+        known = pd.Index(ids).union(pd.Index(list(self.mapping.values()), dtype = object))
+
+        prefixes = ids.str[:-1]
+        hit = prefixes.isin(known) & (prefixes.str.len() > 0)
+        #if several IDs share a prefix, the first one in the data wins, as with the former loop over pd.unique(card_id).
+        #Truncated IDs that are mapped already (e.g. by cardIdMapping.csv of earlier runs) keep their ID (only extended along chains below), such that sessions stored before are not moved to another card.
+        matches = pd.Series(ids[hit].to_numpy(), index = prefixes[hit].to_numpy())
+        matches = matches[~matches.index.duplicated(keep = 'first')]
+        for prefix, cardID in matches.items():
+            self.mapping.setdefault(prefix, cardID)
+
+        #resolve chains, e.g. 12 -> 123 -> 1234, such that every truncated ID maps to its longest known version.
+        #targets are always longer than their keys, so this stops after at most max(len(id)) passes.
+        for _ in range(max([len(x) for x in self.mapping.values()], default = 0)):
+            resolved = {key: self.mapping.get(value, value) for key, value in self.mapping.items()}
+            if resolved == self.mapping:
+                break
+            self.mapping = resolved
+        return self.mapping
+
+    #replace all truncated IDs by their full version. For categorical IDs only the categories are remapped.
+    def apply(self, cardIDs):
+        if isinstance(cardIDs.dtype, pd.CategoricalDtype):
+            return map_categories(cardIDs, lambda ids: ids.map(self.mapping).fillna(ids))
+        return cardIDs.map(self.mapping).fillna(cardIDs)
+
+    #mapping as a table, one row per truncated ID
+    def table(self):
+        return pd.DataFrame({'truncated_id': list(self.mapping.keys()), 'card_id': list(self.mapping.values())})
+
+    def save(self, mappingFile = None):
+        mappingFile = mappingFile if mappingFile is not None else self.mappingFile
+        if mappingFile is not None:
+            self.table().to_csv(mappingFile, index = False)
@@ -0,0 +1,107 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+import numpy as np
+import pandas as pd
+
+#pyarrow parses csv files multithreaded and converts types while parsing. Without it, we fall back to the pandas c parser with the same schema.
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+except ImportError:
+    pa = None
+
+""""
+========================== Typed CSV parsing =========================
+"""
+
+# class to read the charging session exports with an explicit schema.
+class CsvBackend:
+    def __init__(self, useThreads = True):
+        self.useThreads = useThreads
+        self.engine = 'pyarrow' if pa is not None else 'c'
+
+    #columnTypes has the type per column: 'category' for IDs (parsed as dictionary, so every unique ID is stored once), 'timestamp' for dates (utc),
+    #'string' for free text, 'int64' or 'float64'. Columns not listed are inferred by the parser. The types per export format are in source_adapters.py.
+    def read(self, path, columnTypes):
+        if pa is not None:
+            return self.read_pyarrow(path, columnTypes)
+        return self.read_pandas(path, columnTypes)
+
+    def read_pyarrow(self, path, columnTypes):
+        types = {'int64': pa.int64(),
+                 'float64': pa.float64(),
+                 'string': pa.string(),
+                 'category': pa.dictionary(pa.int32(), pa.string()),
+                 #handles both the Z suffix and utc offsets like +02:00
+                 'timestamp': pa.timestamp('ns', tz = 'UTC')}
+        with open(path, 'rb') as f:
+            header = f.readline().decode('utf-8-sig').strip().replace('"', '').split(',')
+        convertOptions = pacsv.ConvertOptions(column_types = {column: types[kind] for column, kind in columnTypes.items() if column in header},
+                                              strings_can_be_null = True)
+        table = pacsv.read_csv(path, read_options = pacsv.ReadOptions(use_threads = self.useThreads), convert_options = convertOptions)
+        return table.to_pandas()
+
+    #timestamps are kept as strings here and parsed by the TimestampNormalizer
+    def read_pandas(self, path, columnTypes):
+        return pd.read_csv(path, dtype = self.pandas_types(columnTypes))
+
+    def pandas_types(self, columnTypes):
+        types = {'int64': 'int64', 'float64': 'float64', 'string': 'object', 'category': 'category', 'timestamp': 'object'}
+        return {column: types[kind] for column, kind in columnTypes.items()}
+
+    #reads the file in chunks of chunkSize rows, such that memory is bounded by the chunk size instead of the file size.
+    #uses the pandas parser for all chunks: the streaming reader of pyarrow infers the types of unlisted columns from the first block only, and fails if a later block differs.
+    def read_chunks(self, path, columnTypes, chunkSize = 100000):
+        for chunk in pd.read_csv(path, dtype = self.pandas_types(columnTypes), chunksize = chunkSize):
+            yield chunk
+
+#apply a string function to a categorical series by transforming its categories only, i.e. once per unique value instead of once per row.
+#categories that become equal after the transformation are merged.
+def map_categories(series, function):
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype('category')
+    newCategories = function(pd.Series(series.cat.categories.astype(str)))
+    uniqueCategories = pd.unique(newCategories)
+    #position of every old category in the new set of categories. Missing values keep code -1.
+    lookup = np.append(pd.Index(uniqueCategories).get_indexer(newCategories), -1)
+    codes = lookup[series.cat.codes.to_numpy()]
+    return pd.Series(pd.Categorical.from_codes(codes, uniqueCategories), index = series.index, name = series.name)
+
+#give a categorical column the same categories in all frames, such that pd.concat keeps it categorical instead of falling back to object.
+def align_categories(frames, column):
+    categories = pd.Index([])
+    for frame in frames:
+        if column in frame:
+            categories = categories.union(frame[column].astype('category').cat.categories)
+    for frame in frames:
+        if column in frame:
+            frame[column] = frame[column].astype('category').cat.set_categories(categories)
+    return frames
+
+#concatenate frames such that all categorical columns stay categorical, also if their categories differ per frame (e.g. per chunk of a file)
+def concat_aligned(frames, **kwargs):
+    names = dict.fromkeys(name for frame in frames for name in frame.columns if isinstance(frame[name].dtype, pd.CategoricalDtype))
+    for name in names:
+        align_categories(frames, name)
+    return pd.concat(frames, **kwargs)
@@ -24,6 +24,7 @@
 import pandas as pd
 import os
 import math
+from filter_data_process import column
 
 
 """"
@@ -33,11 +34,13 @@ import math
 # FIXME what about cars we don't have data for (ie no historical information). What does DEMKit do when planning for 2 cars and 1 doesnt come (ie empty real data?)
 
 # class to generate txt file to use as input for DEMKit simulation. Similar layout as ALPG output. Supports multiple sessions per car. 
+# endTimes is the EndTimeGrid of StatisticalAnalysis.dwell_time_stats (see end_time_grid.py). Its keys (e.g. 'end_s50d75', 'end_smean_dmean') are read directly from it and do not have to be columns of dataStats.
 class DemkitSessions:
-    def __init__(self, dataStats, dataReal, ScenarioPrefix):
+    def __init__(self, dataStats, dataReal, ScenarioPrefix, endTimes = None):
         self.dataStats = dataStats
         self.dataReal = dataReal
         self.ScenarioPrefix = ScenarioPrefix
+        self.endTimes = endTimes
 
         # location to store txt files
         self.data_dir = os.path.join('output/')
@@ -49,7 +52,6 @@ class DemkitSessions:
 # filePrefix is prefix of saved txt file in ALPG output format, one for real and one for estimated data with the file names 'fileprefix'_real.txt and 'fileprefix'_estimate.txt respectively
 # staticDefault is what we take as the estimated input in case there is no historical data on an individual car
     def generateDemkitSessionInput(self, keyStats, keyReal, filePrefix, rounding = None, staticDefault = None, perCar=True):
-        dataStats = self.dataStats
         dataReal = self.dataReal
         data_dir = self.data_dir
 
@@ -84,12 +86,12 @@ class DemkitSessions:
             for sessionIndex in range(0,nSession):
                 #put session value and a comma for both real and estimated files
                 with open(data_dir+'{}_real.txt'.format(filePrefix), 'a') as f:
-                    f.writelines('{},'.format(str(correct(tempReal[keyReal].iloc[[sessionIndex]].values[0])))) #Solved problem that indexing was returning errors due to mask. See https://stackoverflow.com/questions/46307490/how-can-i-extract-the-nth-row-of-a-pandas-data-frame-as-a-pandas-data-frame
+                    f.writelines('{},'.format(str(correct(column(tempReal, keyReal).iloc[[sessionIndex]].values[0])))) #Solved problem that indexing was returning errors due to mask. See https://stackoverflow.com/questions/46307490/how-can-i-extract-the-nth-row-of-a-pandas-data-frame-as-a-pandas-data-frame
                 
                 #if only interested in aggregated profile, and don't need to track individual EVs afterwards, model each session as seperate EV in DEMKit
                 if not perCar:
                     try:
-                        carEstimate = str(correct(dataStats[dataStats['card_id']==car][keyStats].values[sessionIndex]))
+                        carEstimate = str(correct(self.estimate(car, keyStats, sessionIndex)))
                         with open(data_dir+'{}_estimate.txt'.format(filePrefix), 'a') as g:
                             g.writelines('{},'.format(carEstimate))
                     except:
@@ -113,10 +115,11 @@ class DemkitSessions:
                         with open(data_dir+'{}_estimate.txt'.format(filePrefix), 'a') as g:
                             g.writelines('{}:'.format(carCount))
                 #FIXME Having overlapping sessions does not work for DEMKit. Could try to put the estimation to each successive day, but to simulate multiple days, can just run the code multiple times and adapt time filters.
+                #FilteringData.validate_sessions reports such sessions, and drops them with autoFix = True.
             #FIXME sanity check, need if perCar to be within session loop? Then tab right...
             if perCar:
                 try:
-                    carEstimate = str(correct(dataStats[dataStats['card_id']==car][keyStats].values[0]))
+                    carEstimate = str(correct(self.estimate(car, keyStats)))
                     with open(data_dir+'{}_estimate.txt'.format(filePrefix), 'a') as g:
                         g.writelines('{},'.format(carEstimate))
                 except:
@@ -147,6 +150,14 @@ class DemkitSessions:
             print(filePrefix, 'empty')    
         return
 
+# estimated value of keyStats for a car. Raises an exception if there is none, e.g. if the car is not in the training set.
+    def estimate(self, car, keyStats, sessionIndex = 0):
+        dataStats = self.dataStats
+        if self.endTimes is not None and keyStats in self.endTimes and keyStats not in dataStats.columns:
+            #one end time estimate per car
+            return self.endTimes.lookup(keyStats, [car])[0]
+        return dataStats[dataStats['card_id']==car][keyStats].values[sessionIndex]
+
 # slightly different format for generating EV specs (ie file with capacity and max charging power)
 # rounding can have values {None, 'up', 'down', 'closest'}
 # filePrefix is prefix of saved txt file in ALPG output format, one for real and one for estimated data with the file names 'fileprefix'_real.txt and 'fileprefix'_estimate.txt respectively
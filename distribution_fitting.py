@@ -0,0 +1,220 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import warnings
+import functools
+import multiprocessing
+import numpy as np
+import pandas as pd
+import scipy
+from worker_pool import can_fork, fork_pool
+
+""""
+========================== Distribution Fitting =========================
+"""
+
+#families are the names of scipy.stats distributions, or 'mixture<k>' for a mixture of k normal distributions (fitted with EM)
+defaultFamilies = ['lognorm', 'gamma', 'weibull_min', 'beta', 'norm', 'mixture2']
+
+#families with support x > 0. Their location is fixed at 0, so they are fitted on their shape and scale only
+positiveFamilies = ['lognorm', 'gamma', 'weibull_min', 'expon']
+
+#location and scale of the beta distribution: the range of the values, widened by 1% on both sides such that the smallest and largest value have a positive density
+def beta_support(values):
+    low, high = values.min(), values.max()
+    margin = 0.01*(high - low)
+    return low - margin, high - low + 2*margin
+
+#families whose MLE scipy solves (semi-)analytically. Starting values would make scipy fall back to its generic optimizer, so they are not warm started
+analyticFamilies = ['lognorm', 'gamma', 'norm', 'expon']
+
+#starting values of the shape, location and scale of a family from the moments of the binned values, such that the MLE starts close to the optimum.
+#Returns the positional shape guesses and keyword guesses for the free location and scale.
+def start_parameters(family, values, bins):
+    counts, edges = np.histogram(values, bins = bins)
+    centres = (edges[:-1] + edges[1:])/2
+    mean = np.average(centres, weights = counts)
+    var = np.average((centres - mean)**2, weights = counts)
+    if family == 'weibull_min':
+        #Justus' approximation of the shape from the coefficient of variation
+        c = (np.sqrt(var)/mean)**-1.086
+        return [c], {'scale': mean/scipy.special.gamma(1 + 1/c)}
+    if family == 'beta':
+        loc, scale = beta_support(values)
+        mu, v = (mean - loc)/scale, var/scale**2
+        common = mu*(1 - mu)/v - 1
+        return [mu*common, (1 - mu)*common], {}
+    return [], {}
+
+#log density of normal distributions with means and stds (broadcast), without the overhead of scipy.stats in the EM loop
+def norm_logpdf(x, means, stds):
+    return -0.5*((x - means)/stds)**2 - np.log(stds) - 0.5*np.log(2*np.pi)
+
+def logsumexp(logValues):
+    largest = logValues.max(axis = -1, keepdims = True)
+    return (largest + np.log(np.exp(logValues - largest).sum(axis = -1, keepdims = True)))[..., 0]
+
+#EM fit of a mixture of normal distributions on values, weighted by weights (e.g. the counts of binned values). params is [weights..., means..., stds...] to start from.
+def mixture_em(values, weights, params, iterations = 200, tol = 1e-8):
+    share, means, stds = np.split(np.asarray(params, dtype = float), 3)
+    total = weights.sum()
+    #keeps components from collapsing onto a single value
+    minStd = 1e-3*np.sqrt(np.cov(values, aweights = weights)) if len(values) > 1 else 1e-3
+    previous = -np.inf
+    for _ in range(iterations):
+        logDensity = np.log(share) + norm_logpdf(values[:, None], means, stds)
+        logLikelihood = logsumexp(logDensity)
+        current = np.dot(weights, logLikelihood)
+        responsibility = np.exp(logDensity - logLikelihood[:, None])*weights[:, None]
+        sizes = responsibility.sum(axis = 0) + 1e-300
+        share = sizes/total
+        means = responsibility.T @ values/sizes
+        stds = np.maximum(np.sqrt((responsibility*(values[:, None] - means)**2).sum(axis = 0)/sizes), minStd)
+        if current - previous <= tol*abs(current):
+            break
+        previous = current
+    order = np.argsort(means)
+    return np.concatenate([share[order], means[order], stds[order]])
+
+#mixture of normal distributions on values. With warmStart, EM first runs on the binned values, after which a few iterations on all values polish the result.
+#Samples with fewer values than bins are not binned, since that would not save anything.
+def fit_mixture(values, components, warmStart, bins):
+    #start with equal weights and the components spread over the quantiles
+    params = np.concatenate([np.full(components, 1/components),
+                             np.quantile(values, (np.arange(components) + 0.5)/components),
+                             np.full(components, np.std(values)/components + 1e-12)])
+    if warmStart and len(values) > bins:
+        counts, edges = np.histogram(values, bins = bins)
+        keep = counts > 0
+        params = mixture_em(((edges[:-1] + edges[1:])/2)[keep], counts[keep].astype(float), params)
+        return mixture_em(values, np.ones(len(values)), params, iterations = 20)
+    return mixture_em(values, np.ones(len(values)), params)
+
+def mixture_logpdf(x, params):
+    share, means, stds = np.split(np.asarray(params, dtype = float), 3)
+    return logsumexp(np.log(share) + norm_logpdf(np.asarray(x, dtype = float)[..., None], means, stds))
+
+def mixture_cdf(x, params):
+    share, means, stds = np.split(np.asarray(params, dtype = float), 3)
+    return (share*scipy.stats.norm.cdf(np.asarray(x, dtype = float)[..., None], means, stds)).sum(axis = -1)
+
+#fit one family to values. Returns the parameters, the log likelihood, the Akaike information criterion and the Kolmogorov-Smirnov statistic.
+#A family that does not apply (e.g. lognorm on values <= 0) or does not converge gets NaN.
+def fit_family(family, values, warmStart = True, bins = 256):
+    result = {'family': family, 'n': len(values), 'params': None, 'log_likelihood': np.nan, 'aic': np.nan, 'ks': np.nan}
+    #scipy warns about poorly converging fits, which simply end up at the bottom of the ranking
+    with warnings.catch_warnings(), np.errstate(all = 'ignore'):
+        warnings.simplefilter('ignore')
+        try:
+            if family.startswith('mixture'):
+                params = fit_mixture(values, int(family[len('mixture'):]), warmStart, bins)
+                logLikelihood = mixture_logpdf(values, params).sum()
+                cdf = lambda x: mixture_cdf(x, params)
+                freeParameters = len(params) - 1
+            else:
+                distribution = getattr(scipy.stats, family)
+                fixed = {}
+                if family in positiveFamilies:
+                    if values.min() <= 0:
+                        return result
+                    fixed = {'floc': 0}
+                elif family == 'beta':
+                    fixed = dict(zip(['floc', 'fscale'], beta_support(values)))
+                shapes, guesses = start_parameters(family, values, bins) if warmStart and family not in analyticFamilies else ([], {})
+                params = distribution.fit(values, *shapes, **{key: value for key, value in guesses.items() if 'f' + key not in fixed}, **fixed)
+                logLikelihood = distribution.logpdf(values, *params).sum()
+                cdf = lambda x: distribution.cdf(x, *params)
+                #the beta support is derived from the data, so it counts as parameters, the fixed location 0 does not
+                freeParameters = len(params) - (1 if family in positiveFamilies else 0)
+        except Exception:
+            return result
+    if not np.isfinite(logLikelihood):
+        return result
+    result.update({'params': tuple(float(p) for p in params),
+                   'log_likelihood': logLikelihood,
+                   'aic': 2*freeParameters - 2*logLikelihood,
+                   'ks': scipy.stats.kstest(values, cdf).statistic})
+    return result
+
+#fit all families to a list of (key, values) samples. Runs in the worker processes.
+def fit_samples(samples, families, warmStart, bins):
+    rows = []
+    for key, values in samples:
+        for family in families:
+            rows.append(dict(key, **fit_family(family, values, warmStart, bins)))
+    return rows
+
+# class to fit a list of distribution families to many samples (e.g. each variable, globally and per car) and rank the candidates per sample.
+# mode = 'parallel' fits the samples on a pool of worker processes (see worker_pool.py), in chunks, 'sync' fits them directly. Without worker processes it falls back to 'sync'.
+# With warmStart, every MLE starts from the moments of the binned values (mixtures run EM on the binned values first), which saves most iterations on large samples.
+class DistributionFitter:
+    def __init__(self, families = None, mode = 'parallel', workers = None, warmStart = True, bins = 256, rankBy = 'aic', minSessions = 10):
+        if mode not in ['parallel', 'sync']:
+            raise ValueError("mode should be 'parallel' or 'sync', not {}".format(mode))
+        if rankBy not in ['aic', 'ks']:
+            raise ValueError("rankBy should be 'aic' or 'ks', not {}".format(rankBy))
+        if mode == 'parallel' and not can_fork():
+            mode = 'sync'
+        self.families = families if families is not None else defaultFamilies
+        self.mode = mode
+        self.workers = workers if workers is not None else multiprocessing.cpu_count()
+        self.warmStart = warmStart
+        self.bins = bins
+        self.rankBy = rankBy
+        #samples with fewer (non-NaN) values are not fitted
+        self.minSessions = minSessions
+
+    #fit all families to the samples, a list of (key, values) with key a dict such as {'variable': 'energy', 'card_id': ...}.
+    #Returns one row per sample and family with the key columns, family, n, params, log_likelihood, aic, ks and rank (1 = best by rankBy, NaN fits last).
+    def fit(self, samples):
+        samples = [(key, np.asarray(values, dtype = float)) for key, values in samples]
+        samples = [(key, values[~np.isnan(values)]) for key, values in samples]
+        samples = [(key, values) for key, values in samples if len(values) >= self.minSessions]
+        fit = functools.partial(fit_samples, families = self.families, warmStart = self.warmStart, bins = self.bins)
+        if self.mode == 'parallel' and len(samples) > 1:
+            #a few chunks per worker balances the load without sending every sample separately
+            chunks = [samples[i::4*self.workers] for i in range(min(len(samples), 4*self.workers))]
+            with fork_pool(self.workers) as pool:
+                rows = [row for chunkRows in pool.map(fit, chunks) for row in chunkRows]
+        else:
+            rows = fit(samples)
+        keys = list(samples[0][0]) if samples else []
+        return self.rank(pd.DataFrame(rows, columns = keys + ['family', 'n', 'params', 'log_likelihood', 'aic', 'ks']), keys)
+
+    #rank the families per sample, 1 being the best
+    def rank(self, fits, keys):
+        #a constant key ranks all fits together
+        groups = [fits[name] for name in keys] if keys else np.zeros(len(fits))
+        fits['rank'] = fits.groupby(groups, sort = False, dropna = False)[self.rankBy].rank(method = 'first', na_option = 'bottom')
+        return fits.sort_values(keys + ['rank'], kind = 'stable').reset_index(drop = True)
+
+    #best family per sample
+    def best(self, fits):
+        return fits[fits['rank'] == 1].reset_index(drop = True)
+
+#density of a fitted family at x, e.g. to plot a row of DistributionFitter.fit()
+def fitted_pdf(family, params, x):
+    if family.startswith('mixture'):
+        return np.exp(mixture_logpdf(x, params))
+    return getattr(scipy.stats, family).pdf(x, *params)
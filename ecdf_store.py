@@ -0,0 +1,144 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import pandas as pd
+from statsmodels.distributions.empirical_distribution import ECDF
+
+""""
+========================== ECDF Store =========================
+"""
+
+# class to hold the empirical cumulative distribution functions (ECDFs) of several variables for all cars.
+# Per variable, the values of all cars are stored in one array, sorted by car and then by value, together with the offset of each car in it (ragged array).
+# The ECDF of car i is then values[offsets[i]:offsets[i+1]], and the CDFs and their inverses are evaluated for many cars and points in one vectorized call.
+# Cars are identified by their card ID and kept in the order of carStats.
+class EcdfStore:
+    def __init__(self, cardIDs):
+        self.cardIDs = pd.Index(cardIDs)
+        self.values = {}
+        self.offsets = {}
+
+    #add the ECDFs of a variable. codes holds the row of each value in cardIDs, e.g. from pd.factorize. NaN values are left out.
+    def add(self, name, codes, values):
+        values = np.asarray(values, dtype = float)
+        codes = np.asarray(codes)
+        known = ~np.isnan(values)
+        values, codes = values[known], codes[known]
+        order = np.lexsort((values, codes))
+        self.values[name] = values[order]
+        self.offsets[name] = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength = len(self.cardIDs)))])
+        return self
+
+    def names(self):
+        return list(self.values.keys())
+
+    #rows of the given card IDs. None means all cars. Raises a KeyError for unknown card IDs.
+    def rows(self, cards = None):
+        if cards is None:
+            return np.arange(len(self.cardIDs))
+        rows = self.cardIDs.get_indexer(pd.Index(np.atleast_1d(cards)))
+        if (rows < 0).any():
+            raise KeyError('Unknown card IDs: {}'.format(list(pd.Index(np.atleast_1d(cards))[rows < 0])))
+        return rows
+
+    #number of values per car
+    def counts(self, name, cards = None):
+        rows = self.rows(cards)
+        return self.offsets[name][rows + 1] - self.offsets[name][rows]
+
+    #points are either one list of points for all cars, or one row of points per car. Returns them as array of shape (cars, points).
+    def points(self, rows, points):
+        points = np.asarray(points, dtype = float)
+        if points.ndim <= 1:
+            return np.broadcast_to(np.atleast_1d(points)[None, :], (len(rows), np.atleast_1d(points).size))
+        if len(points) != len(rows):
+            raise ValueError('Expected one row of points per car, got {} rows for {} cars'.format(len(points), len(rows)))
+        return points
+
+    #number of values <= points per car. A binary search within the slice of every car, run for all cars and points at the same time.
+    def count_below(self, name, rows, points):
+        values = self.values[name]
+        start = np.broadcast_to(self.offsets[name][rows][:, None], points.shape)
+        low = start.copy()
+        high = np.broadcast_to(self.offsets[name][rows + 1][:, None], points.shape).copy()
+        #invariant: within the slice of the car, all values before low are <= point, all values from high on are > point
+        while (low < high).any():
+            active = low < high
+            middle = (low + high) // 2
+            right = active & (values[np.minimum(middle, len(values) - 1)] <= points)
+            low = np.where(right, middle + 1, low)
+            high = np.where(active & ~right, middle, high)
+        return low - start
+
+    #ECDF of the cars at the points, i.e. the fraction of values <= point. Same as ECDF(values)(points) of statsmodels. Shape (cars, points).
+    #NaN for cars without values.
+    def cdf(self, name, points, cards = None):
+        rows = self.rows(cards)
+        points = self.points(rows, points)
+        counts = (self.offsets[name][rows + 1] - self.offsets[name][rows])[:, None]
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return self.count_below(name, rows, points) / counts
+
+    #inverse of the ECDF: the smallest value x of the car with cdf(x) >= probability. Probability 0 gives the minimum, 1 the maximum. Shape (cars, probabilities).
+    #NaN for cars without values.
+    def quantile(self, name, probabilities, cards = None):
+        rows = self.rows(cards)
+        probabilities = self.points(rows, probabilities)
+        start = self.offsets[name][rows][:, None]
+        counts = self.offsets[name][rows + 1][:, None] - start
+        #rounded first, such that e.g. 0.6*10 = 6.000000000000001 is not taken as a fraction above 6
+        index = np.clip(np.ceil(np.round(probabilities*counts, 9)).astype(int) - 1, 0, np.maximum(counts - 1, 0))
+        values = self.values[name]
+        if len(values) == 0:
+            return np.full(probabilities.shape, np.nan)
+        return np.where(counts > 0, values[np.minimum(start + index, len(values) - 1)], np.nan)
+
+    #sorted values of a single car
+    def car_values(self, name, card):
+        row = self.rows(card)[0]
+        return self.values[name][self.offsets[name][row]:self.offsets[name][row + 1]]
+
+    #statsmodels ECDF object of a single car, e.g. for plotting
+    def ecdf(self, name, card):
+        return ECDF(self.car_values(name, card))
+
+    #the store is a handful of flat arrays, so it is saved as a single uncompressed .npz file, which loads without any recomputation.
+    def save(self, path):
+        arrays = {'card_id': self.cardIDs.astype(str).to_numpy(dtype = str)}
+        for name in self.values:
+            arrays['values/{}'.format(name)] = self.values[name]
+            arrays['offsets/{}'.format(name)] = self.offsets[name]
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle = False) as arrays:
+            store = cls(arrays['card_id'])
+            for key in arrays.files:
+                if key.startswith('values/'):
+                    name = key.split('/', 1)[1]
+                    store.values[name] = arrays[key]
+                    store.offsets[name] = arrays['offsets/{}'.format(name)]
+        return store
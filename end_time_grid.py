@@ -0,0 +1,92 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import pandas as pd
+
+""""
+========================== End Time Grid =========================
+"""
+
+# class to hold the estimated end times per car for all combinations of a start time and a dwell time estimate (e.g. percentiles, or mean/max/...).
+# Per grid, the end times are one array of shape (cars, start estimates, dwell estimates) instead of one carStats column per combination.
+# Columns are only materialized when a consumer asks for a specific key, e.g. 'end_s50d75' or 'end_smean_dmean'.
+class EndTimeGrid:
+    #cardIDs in the order of the rows of the estimates. Dwell times shorter than dwell (seconds) are enforced to dwell.
+    def __init__(self, cardIDs, dwell = 1800):
+        self.cardIDs = pd.Index(cardIDs)
+        self.dwell = dwell
+        #per grid: start labels, dwell labels, enforced dwell times (cars, dwell labels) and end times (cars, start labels, dwell labels)
+        self.grids = []
+        #key -> (grid, start index, dwell index). Enforced dwell times have start index None.
+        self.keys = {}
+
+    #add a grid. starts and dwells map a label to the estimate per car in seconds, e.g. {50: carStats['s50'], ...}.
+    #keyFormat names the end time columns, enforcedFormat the enforced dwell time columns.
+    def add(self, starts, dwells, keyFormat = 'end_s{}d{}', enforcedFormat = 'd{}Enforced'):
+        startLabels, dwellLabels = list(starts), list(dwells)
+        startTimes = np.column_stack([np.asarray(starts[label], dtype = float) for label in startLabels])
+        #To prevent errors due to start and end times of a session being less than 15 minutes apart, or within the same 15 min interval, we enforce a minimum duration
+        enforced = np.column_stack([np.asarray(dwells[label], dtype = float) for label in dwellLabels])
+        enforced[enforced < self.dwell] = self.dwell
+        ends = startTimes[:, :, None] + enforced[:, None, :]
+
+        grid = len(self.grids)
+        self.grids += [(startLabels, dwellLabels, enforced, ends)]
+        for j, dwellLabel in enumerate(dwellLabels):
+            self.keys[enforcedFormat.format(dwellLabel)] = (grid, None, j)
+            for i, startLabel in enumerate(startLabels):
+                self.keys[keyFormat.format(startLabel, dwellLabel)] = (grid, i, j)
+        return self
+
+    def __contains__(self, key):
+        return key in self.keys
+
+    #values of a key for all cars, in the order of cardIDs
+    def values(self, key):
+        if key not in self.keys:
+            raise KeyError('Unknown end time key: {}'.format(key))
+        grid, i, j = self.keys[key]
+        startLabels, dwellLabels, enforced, ends = self.grids[grid]
+        return enforced[:, j] if i is None else ends[:, i, j]
+
+    #values of a key for the given card IDs. Raises a KeyError for unknown card IDs.
+    def lookup(self, key, cards):
+        rows = self.cardIDs.get_indexer(pd.Index(np.atleast_1d(cards)))
+        if (rows < 0).any():
+            raise KeyError('Unknown card IDs: {}'.format(list(pd.Index(np.atleast_1d(cards))[rows < 0])))
+        return self.values(key)[rows]
+
+    #table with card_id and the requested keys, one row per car. keys = None materializes all keys.
+    def columns(self, keys = None):
+        keys = list(self.keys) if keys is None else list(keys)
+        return pd.concat([pd.DataFrame({'card_id': self.cardIDs})] + [pd.DataFrame({key: self.values(key)}) for key in keys], axis = 1)
+
+    #frame (e.g. carStats or the sessions) with the requested keys added, matched on card_id. Cars not in the grid get NaN.
+    def add_columns(self, frame, keys):
+        rows = self.cardIDs.get_indexer(pd.Index(frame['card_id']))
+        frame = frame.copy()
+        for key in keys:
+            frame[key] = np.where(rows >= 0, self.values(key)[rows], np.nan)
+        return frame
@@ -0,0 +1,206 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import os
+import json
+import atexit
+import hashlib
+import inspect
+import numpy as np
+import pandas as pd
+import matplotlib
+#Agg only renders to files and needs no display, also in the worker processes
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from worker_pool import can_fork, fork_pool
+
+""""
+========================== Figure Renderer =========================
+"""
+
+#render one figure. draw(figure, *args, **kwargs) draws on a new figure, which is saved to path and then released.
+#The figure is not registered with pyplot, so it cannot leak into later plots and is freed as soon as this returns.
+def render_figure(path, draw, args, kwargs, figsize, style):
+    with matplotlib.rc_context(style):
+        figure = Figure(figsize = figsize)
+        FigureCanvasAgg(figure)
+        try:
+            draw(figure, *args, **kwargs)
+            figure.savefig(path, bbox_inches = 'tight')
+        finally:
+            figure.clear()
+    return path
+
+#add the content of value to sha. Arrays and frames are hashed on their data, such that equal inputs give equal hashes across runs.
+def update_hash(sha, value):
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        sha.update(repr((type(value).__name__, list(value.columns) if isinstance(value, pd.DataFrame) else value.name, list(value.dtypes.astype(str)) if isinstance(value, pd.DataFrame) else str(value.dtype))).encode())
+        sha.update(pd.util.hash_pandas_object(value, index = True).to_numpy().tobytes())
+    elif isinstance(value, np.ndarray):
+        sha.update(repr((value.dtype.str, value.shape)).encode())
+        if value.dtype.hasobject:
+            sha.update(repr(value.tolist()).encode())
+        else:
+            sha.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, dict):
+        sha.update(b'dict')
+        for key in sorted(value, key = repr):
+            update_hash(sha, key)
+            update_hash(sha, value[key])
+    elif isinstance(value, (list, tuple)):
+        sha.update(repr((type(value).__name__, len(value))).encode())
+        for item in value:
+            update_hash(sha, item)
+    else:
+        sha.update(repr(value).encode())
+
+#source of a draw function, such that changing one plot only invalidates its own figures
+def draw_source(draw):
+    try:
+        return inspect.getsource(draw)
+    except (OSError, TypeError):
+        return '{}.{}'.format(draw.__module__, draw.__qualname__)
+
+# class to render the figures of StatisticalAnalysis headless (Agg), one independent figure per job.
+# mode = 'parallel' renders the figures on a pool of worker processes while the analysis continues, 'sync' renders them directly, 'disabled' renders nothing.
+# Call flush() to wait for all figures (main.py does so after the plots).
+# With cache = True, a figure is only rendered if its key changed: a hash of its input data, the plot parameters (figsize, style, keyword arguments) and the source of its draw function.
+# The keys of the rendered figures are kept in figuresDir/figureManifest.json, which is written by flush().
+class FigureRenderer:
+    #bump to rerender all figures, e.g. after a matplotlib upgrade
+    version = 1
+
+    #style holds the matplotlib rc settings of all figures
+    def __init__(self, mode = 'parallel', workers = None, figuresDir = 'Figures/', style = None, cache = True):
+        if mode not in ['parallel', 'sync', 'disabled']:
+            raise ValueError("mode should be 'parallel', 'sync' or 'disabled', not {}".format(mode))
+        #without worker processes (see worker_pool.py), the figures are rendered directly
+        if mode == 'parallel' and not can_fork():
+            mode = 'sync'
+        self.mode = mode
+        self.workers = workers
+        self.figuresDir = figuresDir
+        self.style = style if style is not None else {'font.size': 16}
+        self.pool = None
+        self.pending = []
+        #figure path -> key of the figure it holds, and the paths rendered or skipped in this run
+        self.cache = cache
+        self.manifestFile = os.path.join(self.figuresDir, 'figureManifest.json')
+        self.manifest = {}
+        if cache and os.path.isfile(self.manifestFile):
+            with open(self.manifestFile, 'r') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == self.version:
+                self.manifest = manifest['figures']
+        self.rendered = []
+        self.skipped = []
+
+    #path of a figure. Creates its folder (e.g. 'Energy_demand/') if needed.
+    def path(self, folder, name):
+        directory = os.path.join(self.figuresDir, folder)
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        return os.path.join(directory, name)
+
+    #key of a figure, see above
+    def key(self, draw, args, kwargs, figsize):
+        sha = hashlib.sha256('v{}|{}'.format(self.version, matplotlib.__version__).encode())
+        sha.update(draw_source(draw).encode())
+        update_hash(sha, [args, kwargs, figsize, self.style])
+        return sha.hexdigest()
+
+    #render figure folder/name with draw(figure, *args, **kwargs). args should be plain data (arrays, frames), since they are sent to the worker processes.
+    #the figure is skipped if it exists and its key did not change since it was rendered.
+    def submit(self, folder, name, draw, *args, figsize = None, **kwargs):
+        if self.mode == 'disabled':
+            return
+        path = self.path(folder, name)
+        key = None
+        if self.cache:
+            key = self.key(draw, args, kwargs, figsize)
+            if self.manifest.get(path) == key and os.path.isfile(path):
+                self.skipped.append(path)
+                return
+            #the old figure is outdated, also if rendering it fails below
+            self.manifest.pop(path, None)
+        if self.mode == 'sync':
+            render_figure(path, draw, args, kwargs, figsize, self.style)
+            self.done(path, key)
+            return
+        if self.pool is None:
+            self.pool = fork_pool(self.workers)
+            #make sure all figures are written before the interpreter exits
+            atexit.register(self.flush)
+        self.pending.append((self.pool.submit(render_figure, path, draw, args, kwargs, figsize, self.style), key))
+
+    def done(self, path, key):
+        self.rendered.append(path)
+        if key is not None:
+            self.manifest[path] = key
+
+    #wait for all figures, update the manifest and return the paths rendered since the last flush. Raises the error of a failed figure here, instead of losing it in the worker.
+    #the manifest is written also if a figure failed, such that the figures that did succeed are not rendered again.
+    def flush(self):
+        pending, self.pending = self.pending, []
+        paths = []
+        error = None
+        for future, key in pending:
+            try:
+                path = future.result()
+            except Exception as e:
+                error = error if error is not None else e
+                continue
+            self.done(path, key)
+            paths.append(path)
+        self.save_manifest()
+        if error is not None:
+            raise error
+        return paths
+
+    def save_manifest(self):
+        if not self.cache:
+            return
+        if not os.path.isdir(self.figuresDir):
+            os.makedirs(self.figuresDir)
+        tmpFile = self.manifestFile + '.tmp'
+        with open(tmpFile, 'w') as f:
+            json.dump({'version': self.version, 'figures': self.manifest}, f, indent = 1, sort_keys = True)
+        os.replace(tmpFile, self.manifestFile)
+
+    #state of the figure cache in this run, e.g. to print at the end of main.py
+    def report(self):
+        if self.mode == 'disabled':
+            return 'Figures: disabled'
+        if not self.cache:
+            return 'Figures: {} rendered (cache off)'.format(len(self.rendered))
+        return 'Figures: {} rendered, {} unchanged and skipped, {} pending, {} in cache {}'.format(len(self.rendered), len(self.skipped), len(self.pending), len(self.manifest), self.manifestFile)
+
+    #wait for all figures and stop the worker processes
+    def close(self):
+        try:
+            return self.flush()
+        finally:
+            if self.pool is not None:
+                self.pool.shutdown()
+                self.pool = None
@@ -21,110 +21,372 @@
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 #    USA
 
+import os
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
 import datetime as dt
 import numpy as np
+from session_store import SessionStore, sortColumns, merge_sorted
+from timestamp_normalization import TimestampNormalizer
+from card_reconciliation import CardIdReconciliation
+from csv_backend import CsvBackend, concat_aligned
+from source_adapters import get_adapter, ingest
+from filter_sweep import FilterSweep
+from session_index import SessionIndex
+from artifact_sink import ArtifactSink
+from session_validation import SessionValidation
+from worker_pool import can_fork, fork_pool
 
 """"
 ========================== Filtering Data =========================
 """
 
+#columns that can be derived from other columns of the session frame. With filter_data(compact = True) these are not stored, but computed on demand.
+derivedColumns = {
+    'dwell_time_utc': lambda data: data['end_datetime_utc'] - data['start_datetime_utc'],
+    'start_datetime_hours': lambda data: data['start_datetime_seconds']/3600,
+    'end_datetime_hours': lambda data: data['end_datetime_seconds']/3600,
+    'dwell_time_hours': lambda data: data['dwell_time_seconds']/3600,
+    'total_energy_Wh': lambda data: data['total_energy']*1000,
+    'average_power_W': lambda data: data['total_energy']*1000/(data['dwell_time_seconds']/3600),
+}
+
+#column of the session frame, whether it is materialized or not
+def column(data, name):
+    if name in data.columns or name not in derivedColumns:
+        return data[name]
+    return derivedColumns[name](data).rename(name)
+
 class FilteringData:
-    def __init__(self):
+    #useCache = True persists the normalized and merged session table (see session_store.py), such that later calls only apply the filters.
+    #appendMode = True only processes sessions that were added to the data files since the last run. Requires useCache = True.
+    #artifacts decides where and how rawDataConcatenated.csv and filteredData.xlsx are written, see artifact_sink.py. By default they are written directly, as csv and xlsx.
+    #streaming = True reads the data files in chunks of chunkSize rows and spills the normalized chunks to the session store, such that memory is bounded by the chunk size.
+    #filter_data then also works through the stored parts one by one, and only keeps the filtered sessions. Requires useCache = True.
+    #dataFiles and dataSchemas override the data files and the name of the source adapter (export format) of each file, see source_adapters.py.
+    #workers is the number of processes that parse the data files in parallel. By default one per file, up to the number of cores.
+    #partitioned = True stores the session table partitioned by site, year and month (always done in streaming mode). filter_data then only reads the partitions
+    #that overlap with its date window and siteFilter. Sessions of sources without a location (location_id) belong to defaultSite.
+    #cardIdMappingFile keeps the mapping of truncated card IDs across runs, see card_reconciliation.py. By default cardIdMapping.csv in cacheDir.
+    #With useCache = False, every run starts from a fresh mapping. It is then only written to cardIdMappingFile (if given) for auditing.
+    def __init__(self, useCache = True, cacheDir = 'cache/', appendMode = False, artifacts = None, streaming = False, chunkSize = 100000, dataFiles = None, dataSchemas = None, workers = None, partitioned = False, defaultSite = 'ASR', cardIdMappingFile = None):
         #import data from Excel sheets
         #we receive our data via two channels that will be combined here. 
         #self.dataFiles = ['transactions_asr_all_2022-09-12T15_55_00.csv', '20220912transactions_asr.csv'] #--> Used in Value of Information study
-        self.dataFiles = ['asrData1.csv', 'asrData2.csv'] #--> Used in PHC study
+        self.dataFiles = ['asrData1.csv', 'asrData2.csv'] if dataFiles is None else dataFiles #--> Used in PHC study
+        #export format of each data file, see source_adapters.py
+        self.dataSchemas = ['transactions', 'lms_sessions'] if dataSchemas is None else dataSchemas
+        if len(self.dataSchemas) != len(self.dataFiles):
+            raise ValueError('Every data file needs a source adapter in dataSchemas')
+        self.adapters = [get_adapter(name) for name in self.dataSchemas]
+        self.workers = workers
+        self.csvBackend = CsvBackend()
 
-    #energyCutoOff in kWh
-    def filter_data(self, startTimeFilter = True, afterStartDate = dt.datetime(2021, 1, 1, 0, 0), beforeEndDate = dt.datetime(2021, 12, 31, 23, 59), energyFilter = True, energyCutOff = 0, defaultCapacity = None, defaultPower = None, maxDwellTime = None, minDwellTime = None, overnightStays = True, managersFilter = None,  listmanagersFilter = None, idFilter = None):
+        self.timestamps = TimestampNormalizer('Europe/Amsterdam')
+        if cardIdMappingFile is None and useCache:
+            cardIdMappingFile = os.path.join(cacheDir, 'cardIdMapping.csv')
+        self.cardIds = CardIdReconciliation(cardIdMappingFile, load = useCache)
+
+        self.sessionStore = SessionStore(cacheDir) if useCache else None
+        self.appendMode = appendMode
+        self.streaming = streaming
+        self.chunkSize = chunkSize
+        self.partitioned = partitioned or streaming
+        self.defaultSite = defaultSite
+        if self.partitioned and (self.sessionStore is None or appendMode):
+            raise ValueError('Streaming mode and the partitioned store require useCache = True and do not support appendMode')
+        self.artifacts = artifacts if artifacts is not None else ArtifactSink()
+        #key and table of the sessions loaded in this process. Saves reading the store again for every filter call.
+        self.sessionsKey = None
+        self.sessions = None
+
+    #reads both data sources and combines them into one normalized session table. Independent of the filter settings.
+    #If the source files did not change since the last call, the table is read from the session store instead.
+    #With appendMode = True, only sessions past the watermark of each source (highest transaction/session_id processed before) are normalized and merged into the stored table.
+    def load_sessions(self):
         dataFiles = self.dataFiles
-        self.defaultPower = defaultPower
-        self.defaultCapacity = defaultCapacity
-        
-        #Data has columns ['transaction', 'chargepoint_id', 'start_datetime_utc', 'end_datetime_utc', 'card_id', 'total_energy']
-        self.rawData = pd.read_csv(dataFiles[0])
-        #data has columns ['session_id','session_start_datetime','session_end_datetime','session_kwh','session_auth_id','session_auth_method','connector_id','connector_standard','connector_format','evse_uid','evse_id','location_id','location_name','location_address','location_city','location_postal_code','location_latitude','location_longitude]
-        self.rawData2 = pd.read_csv(dataFiles[1])
-        
-        rawData = self.rawData
-        rawData2 = self.rawData2
-        
-        #selected filters to delete incomplete data points. 
-        rawData = rawData[rawData.start_datetime_utc.notnull()] #filters out rows where column start_datetime_utc has no value
-        rawData = rawData[rawData.end_datetime_utc.notnull()] #filters out rows where column end_datetime_utc has no value
-        rawData = rawData[rawData.total_energy.notnull()] #filters out rows where column total_energy has no value
-        rawData = rawData[rawData.card_id.notnull()] #filters out rows where card_id has no value
-
-        rawData2 = rawData2[rawData2.session_start_datetime.notnull()] #filters out rows where column start_datetime_utc has no value
-        rawData2 = rawData2[rawData2.session_end_datetime.notnull()] #filters out rows where column end_datetime_utc has no value
-        rawData2 = rawData2[rawData2.session_kwh.notnull()] #filters out rows where column total_energy has no value
-        rawData2 = rawData2[rawData2.session_auth_id.notnull()] #filters out rows where column session_auth_id has no value
-        
-        #dates have type string and format YYYY-MM-DDTHH:MM:SSZ.
-        #Convert to class pandas._libs.tslibs.timestamps.Timestamp and do utc correction        
-        #Dutch European Daylight Saving Time as is since 1977 (+1 CET in winter, +2 CEST in summer). 
-        #CEST 29 March 2020 - 25 October 2020; 28 March 2021 - 31 October 2021; 27 March 2022 - 30 October 2022; 26 March 2023 - 29 October 2023; 31 March 2024 - 27 October 2024
-        #Where condition == False, CET (where-function applies). Else CEST
-        rawData['start_datetime_utc'] = pd.to_datetime(rawData['start_datetime_utc'],format = '%Y-%m-%dT%H:%M:%SZ') + dt.timedelta(hours = 2)
-        rawData['start_datetime_utc'] = rawData['start_datetime_utc'].where((rawData['start_datetime_utc'] >= dt.datetime(2020, 3, 29, 1, 0)) , rawData['start_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['start_datetime_utc'] = rawData['start_datetime_utc'].where((rawData['start_datetime_utc'] > dt.datetime(2020, 10, 25, 1, 0)) & (rawData['start_datetime_utc'] <= dt.datetime(2021,3,21,1,0))==False , rawData['start_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['start_datetime_utc'] = rawData['start_datetime_utc'].where((rawData['start_datetime_utc'] > dt.datetime(2021,10,31,1,0)) & (rawData['start_datetime_utc'] <= dt.datetime(2022,3,27,1,0))==False , rawData['start_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['start_datetime_utc'] = rawData['start_datetime_utc'].where( rawData['start_datetime_utc'] < dt.datetime(2022,10,30,1,0) , rawData['start_datetime_utc'] - dt.timedelta(hours = 1))
-
-        rawData['end_datetime_utc'] = pd.to_datetime(rawData['end_datetime_utc'],format = '%Y-%m-%dT%H:%M:%SZ') + dt.timedelta(hours = 2)
-        rawData['end_datetime_utc'] = rawData['end_datetime_utc'].where((rawData['end_datetime_utc'] >= dt.datetime(2020, 3, 29, 1, 0)) , rawData['end_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['end_datetime_utc'] = rawData['end_datetime_utc'].where((rawData['end_datetime_utc'] > dt.datetime(2020, 10, 25, 1, 0)) & (rawData['end_datetime_utc'] <= dt.datetime(2021,3,21,1,0))==False , rawData['end_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['end_datetime_utc'] = rawData['end_datetime_utc'].where((rawData['end_datetime_utc'] > dt.datetime(2021,10,31,1,0)) & (rawData['end_datetime_utc'] <= dt.datetime(2022,3,27,1,0))==False , rawData['end_datetime_utc'] - dt.timedelta(hours = 1))
-        rawData['end_datetime_utc'] = rawData['end_datetime_utc'].where( rawData['end_datetime_utc'] < dt.datetime(2022,10,30,1,0) , rawData['end_datetime_utc'] - dt.timedelta(hours = 1))
-
-        #dates have type string and format YYYY-MM-DD HH:MM:SSZZ:ZZ.
-        #Convert to class pandas._libs.tslibs.timestamps.Timestamp. Data already utc corrected. Save offset in x['start_utc_offset'] and x['end_utc_offset'].
-        rawData2['start_utc_offset'] = rawData2.apply(lambda x: dt.timedelta(hours = int(x['session_start_datetime'][-5:-3])),axis =1)
-        rawData2['session_start_datetime'] = rawData2.apply(lambda x: x['session_start_datetime'][:-6],axis =1)
-        rawData2['end_utc_offset'] = rawData2.apply(lambda x: dt.timedelta(hours = int(x['session_end_datetime'][-5:-3])),axis =1)
-        rawData2['session_end_datetime'] = rawData2.apply(lambda x: x['session_end_datetime'][:-6],axis =1)
-
-        rawData2['start_datetime_utc'] = pd.to_datetime(rawData2['session_start_datetime'],format = '%Y-%m-%d %H:%M:%S') 
-        rawData2['end_datetime_utc'] = pd.to_datetime(rawData2['session_end_datetime'],format = '%Y-%m-%d %H:%M:%S')
-
-        rawData2['total_energy'] = rawData2['session_kwh']
-        #to make comparable, we use symbols only, not asterixes or dashes in the card_ids.
-        rawData2['card_id'] = rawData2['session_auth_id'].apply(lambda x: str(x).replace("-", ""))
-        rawData['card_id'] = rawData['card_id'].apply(lambda x: x.replace("-", ""))        
-        rawData2['card_id'] = rawData2['card_id'].apply(lambda x: str(x).replace("*", ""))
-        rawData['card_id'] = rawData['card_id'].apply(lambda x: x.replace("*", ""))
-
-        # added this to remove *1 and *2 from evse_uid!
-        rawData2['chargepoint_id'] = rawData2['evse_uid'].astype(str)
-        rawData2['chargepoint_id'] = rawData2['evse_uid'].str.split('*').str[0]
-
-        # added this to avoid having NaN Values in the cluster analysis!
-        rawData2['transaction'] = rawData2['session_id'].apply(lambda x: str(x).replace("NLLMS", ""))
-        
-        # concatenate both datasets and reset panda indices
-        rawData = pd.concat([rawData, rawData2], join = 'outer')
-        rawData.reset_index(drop=True,inplace=True)
+
+        if self.sessionStore is not None:
+            key = self.store_key()
+            if key != self.sessionsKey:
+                self.sessions = self.sessionStore.load(key)
+                self.sessionsKey = key if self.sessions is not None else None
+                if self.sessions is not None:
+                    #segments appended earlier were reconciled with the mapping of their time, which the current mapping only extends
+                    self.sessions['card_id'] = self.cardIds.apply(self.sessions['card_id'])
+                if self.sessions is not None and self.partitioned and self.sessionStore.parts(key) is None:
+                    #table was stored unpartitioned before
+                    self.save_partitions(key, self.sessions)
+            if self.sessions is not None:
+                return self.sessions
+
+        if self.streaming or (self.partitioned and self.sessionStore.parts(key) is not None):
+            #whole table from the stored parts, sorted by start time like the table of a full build. Note that this is not bounded in memory.
+            self.sessions = concat_aligned(list(self.session_chunks()), join = 'outer', ignore_index = True)
+            self.sessions = self.sessions.sort_values(by=['start_datetime_utc', 'data_source', 'transaction'], kind='stable', ignore_index=True)
+            #generating the parts may have extended the card ID mapping, and with it the key
+            self.sessionsKey = self.store_key()
+            return self.sessions
+
+        #previously stored sessions and watermarks to append to. Without those, we rebuild the whole table.
+        storedSessions = None
+        watermarks = {}
+        if self.appendMode and self.sessionStore is not None:
+            storedSessions, watermarks, storedKey = self.sessionStore.load_latest(self.store_settings(cardIdMapping = False))
+            if storedSessions is None:
+                watermarks = {}
+
+        #every data file is parsed and mapped to the common columns by the adapter of its export format, in parallel. Columns and their types are listed in source_adapters.py.
+        #per file, we get the complete sessions we did not process before and the new watermark.
+        results = self.ingest(watermarks)
+
+        # concatenate all datasets and reset panda indices. IDs stay categorical if all sources share the categories.
+        newData = concat_aligned([sessions for sessions, _ in results], join = 'outer')
+        newData.reset_index(drop=True,inplace=True)
 
         # added this to correct faulty user IDs. Backend sometimes drops last digit of ID. We compare them here and correct for that. 
-        # till Oct 2022 manually checked that those are likely the same IDs based on non-overlapping times and energy consumption.
-        for id in pd.unique(rawData['card_id']):
-            if len(rawData[rawData['card_id']==id[:-1]]) > 0:
-                rawData.loc[rawData['card_id']==id[:-1],'card_id'] = id
+        # mapping of truncated to full IDs is saved in cardIdMapping.csv (in cacheDir) for auditing, and extended in later runs. See card_reconciliation.py
+        # new IDs may extend IDs of stored sessions as well, so the stored sessions are remapped too (only a cheap map over the column).
+        # truncated IDs that were mapped before keep their full ID, so the stored sessions of a card stay with that card and appending gives the same table as a full rebuild with the same cardIdMapping.csv.
+        self.cardIds.build(newData['card_id'] if storedSessions is None else pd.concat([storedSessions['card_id'], newData['card_id']]))
+        newData['card_id'] = self.cardIds.apply(newData['card_id'])
+        self.cardIds.save()
+
+        # Check and remove duplicated sessions, only keep the first instance. Sessions of the first data file come first.
+        appended = False
+        if storedSessions is not None:
+            storedSessions['card_id'] = self.cardIds.apply(storedSessions['card_id'])
+            newData = newData.sort_values(by=['data_source'], kind='stable', ignore_index=True)
+            newData.drop_duplicates(subset=['transaction'], keep='first', inplace=True)
+            #new sessions are only checked against the ids of the stored ones. A stored session is kept, unless the new instance comes from an earlier data file (as in a full rebuild).
+            storedSources = pd.Series(storedSessions['data_source'].to_numpy(), index = storedSessions['transaction'].to_numpy())
+            previousSource = storedSources.reindex(newData['transaction'].to_numpy()).to_numpy(dtype = float)
+            appended = not (previousSource > newData['data_source'].to_numpy()).any()
+        if appended:
+            newData = newData[np.isnan(previousSource)]
+            #the stored table is sorted by start time, such that time windows are found by binary search, see session_index.py. Ties are broken by source and id, so appending gives the same order as a full rebuild.
+            newData = newData.sort_values(by=sortColumns, kind='stable', ignore_index=True)
+            rawData = merge_sorted([storedSessions, newData])
+        else:
+            if storedSessions is not None:
+                #rare: a stored session is replaced, so the whole table is deduplicated and stored again
+                rawData = concat_aligned([storedSessions, newData], join = 'outer')
+                rawData = rawData.sort_values(by=['data_source'], kind='stable', ignore_index=True)
+            else:
+                rawData = newData
+            rawData.drop_duplicates(subset=['transaction'], keep='first', inplace=True)
+            rawData = rawData.sort_values(by=sortColumns, kind='stable', ignore_index=True)
+
+        if appended and self.artifacts.appendable('rawDataConcatenated.csv'):
+            #only the new sessions are appended to the csv
+            self.artifacts.write(newData, 'rawDataConcatenated.csv', index=False, append=True)
+        else:
+            self.artifacts.write(rawData, 'rawDataConcatenated.csv', index=False)
+
+        if self.sessionStore is not None:
+            #the table is stored under the key of the extended card ID mapping, such that the next run finds it
+            key = self.store_key()
+            #watermark is the highest session id up to which all sessions had ended. Sessions still in progress (no end time yet) are picked up again in a later refresh.
+            watermarks = {dataFile: max(watermarks.get(dataFile, -1), watermark) for dataFile, (_, watermark) in zip(dataFiles, results)}
+            if self.partitioned:
+                self.save_partitions(key, rawData)
+            elif appended and len(self.sessionStore.segments(storedKey)) < self.sessionStore.maxSegments:
+                #only the appended sessions are written, as a new segment of the stored table
+                self.sessionStore.save_segment(key, storedKey, newData)
+            else:
+                self.sessionStore.save(key, rawData)
+            self.sessionStore.save_latest(key, watermarks, settings = self.store_settings(cardIdMapping = False))
+            self.sessionsKey = key
+        self.sessions = rawData
+        return rawData
 
-        # Added this for drop_duplicates to work properly. 
-        # Since the field 'transaction' was an python object, the drop was not working! =( - hated it
-        rawData['transaction'] = rawData['transaction'].astype('int')  
-        # Since the field 'chargepoint_id' was an python object, the drop was not working! =( - hated it
-        rawData['chargepoint_id'] = rawData['chargepoint_id'].astype('str')  
+    #settings the normalized session table depends on besides the data files. Part of the key of the table in the session store, such that changing any of them rebuilds the table.
+    #The card ID mapping is left out for appending, since the stored sessions are remapped with the extended mapping then.
+    def store_settings(self, cardIdMapping = True):
+        settings = {'dataSchemas': list(self.dataSchemas), 'timezone': self.timestamps.timezone, 'defaultSite': self.defaultSite}
+        if cardIdMapping:
+            settings['cardIdMapping'] = sorted(self.cardIds.mapping.items())
+        return settings
 
-        # Check and remove duplicated sessions, only keep the first instance 
-        rawData.drop_duplicates(subset=['transaction'], keep='first', inplace=True)
+    def store_key(self):
+        return self.sessionStore.key(self.dataFiles, self.store_settings())
 
-        rawData.to_csv('rawDataConcatenated.csv', index=False) 
+    #parses and normalizes all data files, see source_adapters.py. Returns (sessions, watermark) per file.
+    def ingest(self, watermarks = {}):
+        jobs = [(dataFile, adapter, source, watermarks.get(dataFile, -1), self.timestamps.timezone) for source, (dataFile, adapter) in enumerate(zip(self.dataFiles, self.adapters))]
+        workers = min(len(jobs), self.workers if self.workers is not None else (os.cpu_count() or 1))
+        if workers <= 1:
+            return [ingest(*job) for job in jobs]
+        with self.executor(workers) as executor:
+            return list(executor.map(ingest, *zip(*jobs)))
+
+    #worker processes where possible, see worker_pool.py. Otherwise threads are used instead. The parsing itself runs in pyarrow, which releases the GIL.
+    def executor(self, workers):
+        if can_fork():
+            return fork_pool(workers)
+        return ThreadPoolExecutor(max_workers = workers)
+
+    #index on the start time of the session table, see session_index.py
+    def session_index(self):
+        sessions = self.load_sessions()
+        if getattr(self, 'sessionIndex', None) is None or self.sessionIndex.sessions is not sessions:
+            self.sessionIndex = SessionIndex(sessions)
+        return self.sessionIndex
+
+    #sessions starting in [start, end), as a zero-copy slice of the session table. inclusive = 'both' includes sessions starting at end.
+    def window(self, start = None, end = None, inclusive = 'left'):
+        return self.session_index().window(start, end, inclusive)
+
+    #(window start, sessions) per day ('D'), week ('W-MON') or month ('MS'), for walk-forward evaluations
+    def windows(self, freq = 'D', start = None, end = None):
+        return self.session_index().windows(freq, start, end)
+
+    #stored parts of the partitioned session table, one frame at a time. They are generated first if the data files changed.
+    #sites, start and end prune the partitions before reading, see SessionStore.parts. Parts can still hold sessions outside [start, end] within the same month.
+    def session_chunks(self, sites = None, start = None, end = None):
+        key = self.store_key()
+        parts = self.sessionStore.parts(key, sites = sites, start = start, end = end)
+        if parts is None:
+            if self.streaming:
+                self.stream_sessions(key)
+            else:
+                self.load_sessions()
+            #reconciling the card IDs may have extended the mapping, and with it the key
+            key = self.store_key()
+            parts = self.sessionStore.parts(key, sites = sites, start = start, end = end)
+        for path in parts:
+            yield self.sessionStore.read(path)
+
+    def save_partitions(self, key, sessions):
+        self.sessionStore.save_part(key, 0, sessions, self.sites(sessions))
+        self.sessionStore.commit_parts(key)
+
+    #site of each session, used to partition the session store and for the siteFilter
+    def sites(self, sessions):
+        if 'location_id' not in sessions:
+            return pd.Series(self.defaultSite, index = sessions.index, dtype = object)
+        return sessions['location_id'].astype(object).where(sessions['location_id'].notna(), self.defaultSite).astype(str)
+
+    #normalizes the data files chunk by chunk and spills each chunk to the session store. Returns the paths of the stored parts.
+    #The parts are written under key and stored under the key of the card ID mapping they end up with.
+    #Only the state for the steps across chunks is kept in memory: the transaction ids seen so far (dedup) and the unique card ids (reconciliation).
+    def stream_sessions(self, key):
+        seen = set()
+        cardIds = {}
+        columns = {}
+        number = 0
+        for source, (dataFile, adapter) in enumerate(zip(self.dataFiles, self.adapters)):
+            for chunk in self.csvBackend.read_chunks(dataFile, adapter.schema, self.chunkSize):
+                _, sessions = adapter.sessions(chunk, self.timestamps, source = source)
+                cardIds.update(dict.fromkeys(pd.unique(sessions['card_id'])))
+
+                # Check and remove duplicated sessions, only keep the first instance. Sessions of earlier chunks (and the first data file) come first.
+                sessions = sessions.drop_duplicates(subset=['transaction'], keep='first')
+                sessions = sessions[~sessions['transaction'].isin(seen)]
+                if len(sessions) == 0:
+                    continue
+                seen.update(sessions['transaction'].tolist())
+                columns.update(dict.fromkeys(sessions.columns))
+                self.sessionStore.save_part(key, number, sessions, self.sites(sessions))
+                number += 1
+
+        #faulty card ids can only be reconciled once all ids are known, see card_reconciliation.py. The parts are rewritten one at a time.
+        self.cardIds.build(pd.Series(list(cardIds), dtype = object))
+        self.cardIds.save()
+        if number == 0:
+            #no sessions at all, store an empty set of parts
+            os.makedirs(self.sessionStore.parts_dir(key, tmp = True), exist_ok = True)
+        for number, path in enumerate(self.sessionStore.parts(key, tmp = True)):
+            sessions = self.sessionStore.read(path, memoryMap = False)
+            sessions['card_id'] = self.cardIds.apply(sessions['card_id'])
+            self.sessionStore.write(path, sessions)
+            #only csv can be appended to. The parts all get the same columns, such that they line up in one file.
+            if self.artifacts.appendable('rawDataConcatenated.csv'):
+                self.artifacts.write(sessions.reindex(columns = list(columns)), 'rawDataConcatenated.csv', index=False, append=number > 0)
+        key, tmpKey = self.store_key(), key
+        parts = self.sessionStore.commit_parts(key, tmpKey = tmpKey)
+        #sessions in progress are not tracked in streaming mode, so there are no watermarks to append from
+        self.sessionStore.save_latest(key, {}, settings = self.store_settings(cardIdMapping = False))
+        return parts
+
+    #boolean mask (numpy array) of the sessions that pass all filters of filter_data. Every rule only adds one vectorized comparison.
+    def filter_mask(self, sessions, startTimeFilter = True, afterStartDate = dt.datetime(2021, 1, 1, 0, 0), beforeEndDate = dt.datetime(2021, 12, 31, 23, 59), energyFilter = True, energyCutOff = 0, maxDwellTime = None, minDwellTime = None, overnightStays = True, managersFilter = None,  listmanagersFilter = None, idFilter = None, siteFilter = None):
+        mask = np.ones(len(sessions), dtype = bool)
+        start = sessions['start_datetime_utc']
+        end = sessions['end_datetime_utc']
+
+        #filter data to be within certain (start) time period.
+        if startTimeFilter == True:
+            mask &= ((start >= afterStartDate) & (start <= beforeEndDate)).to_numpy()
+        #filter data where the charged energy < 1 kW 
+        if energyFilter == True:
+            mask &= (sessions['total_energy'] >= energyCutOff).to_numpy()
+        #filter data where the dwell time is larger than one day (> 24 hours) or less than 10 min (< 0.16666 hours) 
+        if maxDwellTime is not None or minDwellTime is not None:
+            dwellTimeHours = ((end - start)/ np.timedelta64(1, 'h')).to_numpy()
+            if maxDwellTime is not None:
+                mask &= dwellTimeHours <= maxDwellTime
+            if minDwellTime is not None:
+                mask &= dwellTimeHours >= minDwellTime
+        #filter data where EVs stay past midnight if overnightStays = False
+        if not overnightStays:
+            mask &= (start.dt.day == end.dt.day).to_numpy()
+
+        #filter data where non-unique card ids (e.g. Plug & Charge)
+        if idFilter is not None:
+            mask &= ~sessions['card_id'].isin(set(idFilter)).to_numpy()
         
+        #filter data for only managers MENNEKES CHARGERS
+        if managersFilter == True: # without Mennekes managers
+            mask &= ~sessions['chargepoint_id'].isin(set(listmanagersFilter)).to_numpy()
+        if managersFilter == False: # ONLY Mennekes managers 
+            mask &= sessions['chargepoint_id'].isin(set(listmanagersFilter)).to_numpy()
+
+        #only keep sessions at the given sites (location_id, or defaultSite if the source has no location)
+        if siteFilter is not None:
+            mask &= self.sites(sessions).isin(set(str(site) for site in siteFilter)).to_numpy()
+        return mask
+
+    #sweep over many filter configurations on the session table. The card id and manager filters are fixed for the whole sweep.
+    #returns a FilterSweep, whose row positions refer to load_sessions(). E.g. rows = sweep.sweep(FilterSweep.grid(energyCutOff = [0, 1], maxDwellTime = [12, 24]))
+    def filter_sweep(self, managersFilter = None,  listmanagersFilter = None, idFilter = None, siteFilter = None):
+        sessions = self.load_sessions()
+        baseMask = self.filter_mask(sessions, startTimeFilter = False, energyFilter = False, managersFilter = managersFilter, listmanagersFilter = listmanagersFilter, idFilter = idFilter, siteFilter = siteFilter)
+        return FilterSweep(sessions, baseMask)
+
+    #energyCutoOff in kWh
+    #compact = True keeps IDs categorical, stores seconds and energy as float32, and does not materialize the columns in derivedColumns. Use column(data, name) to get those.
+    #siteFilter is a list of sites (location_id) to keep, see sites(). None keeps all sites.
+    def filter_data(self, startTimeFilter = True, afterStartDate = dt.datetime(2021, 1, 1, 0, 0), beforeEndDate = dt.datetime(2021, 12, 31, 23, 59), energyFilter = True, energyCutOff = 0, defaultCapacity = None, defaultPower = None, maxDwellTime = None, minDwellTime = None, overnightStays = True, managersFilter = None,  listmanagersFilter = None, idFilter = None, compact = False, siteFilter = None):
+        self.defaultPower = defaultPower
+        self.defaultCapacity = defaultCapacity
+
+        #filter data for only managers MENNEKES CHARGERS
+        # If managersFilter == NONE, the dataframe is not touched. So, the analysis is done with all data!!! 
+        if managersFilter == True: # Create a dataframe without Mennekes managers
+            print('manager filter true')
+        if managersFilter == False: # Create a dataframe ONLY for Mennekes managers 
+            print('manager filter false')
+
+        #note cutoff value <= 6 January means midnight between 5 and 6 January. Included time to make it more intuitive. 
+        if self.partitioned and self.sessions is None:
+            #only the partitions of the selected sites and months are read. The filters are applied per part, only the sessions that pass are kept in memory
+            parts = self.session_chunks(siteFilter, afterStartDate, beforeEndDate) if startTimeFilter == True else self.session_chunks(siteFilter)
+            selected = [part.take(np.flatnonzero(self.filter_mask(part, startTimeFilter, afterStartDate, beforeEndDate, energyFilter, energyCutOff, maxDwellTime, minDwellTime, overnightStays, managersFilter, listmanagersFilter, idFilter, siteFilter))) for part in parts]
+            rawData = concat_aligned(selected, join = 'outer', ignore_index = True)
+        else:
+            #the date window is a slice of the sorted session table, the other filters only have to look at the sessions within it.
+            sessions = self.window(afterStartDate, beforeEndDate, inclusive = 'both') if startTimeFilter == True else self.load_sessions()
+
+            #all filters are compiled into one boolean mask over the session table, so the data is only copied once, by the take below.
+            mask = self.filter_mask(sessions, False, afterStartDate, beforeEndDate, energyFilter, energyCutOff, maxDwellTime, minDwellTime, overnightStays, managersFilter, listmanagersFilter, idFilter, siteFilter)
+            #derived columns depend on the filter settings and should not end up in the stored session table. They are only computed for the remaining sessions.
+            rawData = sessions.take(np.flatnonzero(mask))
+
         # Calculate dwell time
-        rawData['dwell_time_utc'] = rawData['end_datetime_utc'] - rawData['start_datetime_utc']
+        dwellTime = rawData['end_datetime_utc'] - rawData['start_datetime_utc']
+        if not compact:
+            rawData['dwell_time_utc'] = dwellTime
         
         # If applicable, define default capacity
         if defaultCapacity is not None:
@@ -135,78 +397,65 @@ class FilteringData:
             rawData['maxPower'] = defaultPower
 
         # Transform start/end/dwell time into hours! Only relative to day time, not time since start.
-        rawData['start_datetime_hours'] = rawData['start_datetime_utc'].dt.hour + rawData['start_datetime_utc'].dt.minute/60 + rawData['start_datetime_utc'].dt.second /3600
-        rawData['end_datetime_hours'] = rawData['end_datetime_utc'].dt.hour + rawData['end_datetime_utc'].dt.minute/60 + rawData['end_datetime_utc'].dt.second /3600
-        rawData['dwell_time_hours'] = rawData['dwell_time_utc']/ np.timedelta64(1, 'h') 
+        if not compact:
+            rawData['start_datetime_hours'] = rawData['start_datetime_utc'].dt.hour + rawData['start_datetime_utc'].dt.minute/60 + rawData['start_datetime_utc'].dt.second /3600
+            rawData['end_datetime_hours'] = rawData['end_datetime_utc'].dt.hour + rawData['end_datetime_utc'].dt.minute/60 + rawData['end_datetime_utc'].dt.second /3600
+            rawData['dwell_time_hours'] = rawData['dwell_time_utc']/ np.timedelta64(1, 'h') 
 
         # Transform start/end/dwell time into seconds! Only relative to day time, not time since start.
         rawData['start_datetime_seconds'] = rawData['start_datetime_utc'].dt.hour*3600 + rawData['start_datetime_utc'].dt.minute*60 + rawData['start_datetime_utc'].dt.second
         rawData['end_datetime_seconds'] = rawData['end_datetime_utc'].dt.hour*3600 + rawData['end_datetime_utc'].dt.minute*60 + rawData['end_datetime_utc'].dt.second 
-        rawData['dwell_time_seconds'] = rawData['dwell_time_utc']/ np.timedelta64(1, 's')
+        rawData['dwell_time_seconds'] = dwellTime/ np.timedelta64(1, 's')
 
         # Transform start/end/dwell time into seconds till start of filter! Only relevant for test data conversion, not for statistical analysis
         rawData['start_secondsSinceStart'] = (rawData['start_datetime_utc'] - afterStartDate).dt.total_seconds()
         rawData['end_secondsSinceStart'] = (rawData['end_datetime_utc'] - afterStartDate).dt.total_seconds()
 
         # Transform energy from kWh to Wh
-        rawData['total_energy_Wh'] = rawData['total_energy']*1000
-        rawData['average_power_W'] = rawData['total_energy_Wh']/rawData['dwell_time_hours']
+        if not compact:
+            rawData['total_energy_Wh'] = rawData['total_energy']*1000
+            rawData['average_power_W'] = rawData['total_energy_Wh']/rawData['dwell_time_hours']
+        else:
+            #seconds within a day/session and energies are exact enough in float32. Seconds since start can span years and stay float64.
+            rawData = rawData.astype({'start_datetime_seconds': 'float32', 'end_datetime_seconds': 'float32', 'dwell_time_seconds': 'float32', 'total_energy': 'float32'})
 
-        print(rawData.dtypes)
+        self.artifacts.log(rawData.dtypes)
 
-        #initialize here before applying filters
         self.filteredData = rawData
 
-        #filter data to be within certain (start) time period.
-        #note cutoff value <= 6 January means midnight between 5 and 6 January. Included time to make it more intuitive. 
-        if startTimeFilter == True:
-            filterArgument = 'start_datetime_utc'
-            self.filteredData = self.filteredData[(self.filteredData[filterArgument] >= afterStartDate)&(self.filteredData[filterArgument] <= beforeEndDate)]
-        #filter data where the charged energy < 1 kW 
-        if energyFilter == True:
-            filterArgument = 'total_energy'
-            self.filteredData = self.filteredData[self.filteredData[filterArgument] >= energyCutOff]
-        #filter data where the dwell time is larger than one day (> 24 hours) 
-        if maxDwellTime is not None:
-            filterArgument = 'dwell_time_hours'
-            self.filteredData = self.filteredData[self.filteredData[filterArgument] <= maxDwellTime]  
-        #filter data where the dwell time is less than 10 min (< 0.16666 hours) 
-        if minDwellTime is not None:
-            filterArgument = 'dwell_time_hours'
-            self.filteredData = self.filteredData[self.filteredData[filterArgument] >= minDwellTime]  
-        #filter data where EVs stay past midnight if overnightStays = False
-        if not overnightStays:
-            self.filteredData = self.filteredData[self.filteredData['start_datetime_utc'].dt.day == self.filteredData['end_datetime_utc'].dt.day]
-
-        #filter data where non-unique card ids (e.g. Plug & Charge)
-        if idFilter is not None:
-            for aspect in idFilter:
-                self.filteredData = self.filteredData[self.filteredData['card_id'] != aspect]
-        
-        #filter data for only managers MENNEKES CHARGERS
-        # If managersFilter == NONE, the dataframe is not touched. So, the analysis is done with all data!!! 
-        if managersFilter == True: # Create a dataframe without Mennekes managers
-            print('manager filter true')
-            for aspect in listmanagersFilter:
-                self.filteredData = self.filteredData[self.filteredData['chargepoint_id'] != aspect]
-            #self.filteredData.to_csv('datawithoutmanagers.csv', index=True)
-        if managersFilter == False: # Create a dataframe ONLY for Mennekes managers 
-            print('manager filter false')
-            self.filteredData = self.filteredData[self.filteredData['chargepoint_id'].isin(listmanagersFilter)]
-            #self.filteredData.to_csv('onlydatamanagers.csv', index=True)
+        #IDs are categorical in the session table. Downstream analysis works with plain strings, unless we asked for the compact schema.
+        if compact:
+            self.filteredData = self.filteredData.assign(card_id = self.filteredData['card_id'].cat.remove_unused_categories(), chargepoint_id = self.filteredData['chargepoint_id'].cat.remove_unused_categories())
+        else:
+            self.filteredData = self.filteredData.astype({'card_id': 'str', 'chargepoint_id': 'str'})
 
         #sort by start date. Relevant for sampling process in ProvideHomeCommute study where we take the last x sessions in the dataset
         self.filteredData = self.filteredData.sort_values(by=['start_secondsSinceStart'],ignore_index=True)
         
-        self.rawData = rawData
-        self.filteredData.to_excel("filteredData.xlsx")
+        self.rawData = self.sessions if self.partitioned else self.load_sessions()
+        self.artifacts.write(self.filteredData, "filteredData.xlsx")
     
         return self.filteredData
 
+    #checks the filtered sessions (or the given sessions) for negative dwell times, overlapping or back-to-back sessions per car and double occupied chargepoints, see session_validation.py.
+    #returns the report, one row per finding. autoFix = True drops the sessions of the checks in fixChecks and stores the result in self.filteredData, e.g. for DEMKit which cannot handle overlapping sessions per car.
+    def validate_sessions(self, sessions = None, autoFix = False, fixChecks = ('negative_dwell', 'car_overlap'), backToBackGap = 60):
+        validation = SessionValidation(backToBackGap)
+        sessions = self.filteredData if sessions is None else sessions
+        self.validationReport = validation.validate(sessions)
+        self.artifacts.log(validation.summary(self.validationReport))
+        if autoFix:
+            self.filteredData = validation.fix(sessions, fixChecks)
+        return self.validationReport
+
     #dwell is in seconds
+    #carStats is a CarStats (see car_stats.py), whose columns are added with an index join on card_id. A carStats frame is merged as before.
     def online_estimate_end(self, carStats = None, dwell = 0, constant = 6*3600):
-        if carStats is not None:
+        if isinstance(carStats, pd.DataFrame):
             self.filteredData = self.filteredData.merge(carStats, on = 'card_id', how = 'left')
+        elif carStats is not None:
+            self.filteredData = carStats.join(self.filteredData)
+        if carStats is not None:
             self.filteredData['count'] = self.filteredData['count'].fillna(0)
             for aspect in ['mean', 'max', 'min', '75', '50', '25']:
                 self.filteredData['end_sreal_d{}'.format(aspect)] = self.filteredData['start_secondsSinceStart'] + self.filteredData['dwell_time_{}'.format(aspect)].fillna(dwell).apply(lambda x: max(x,dwell))
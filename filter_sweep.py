@@ -0,0 +1,120 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import itertools
+import datetime as dt
+import numpy as np
+import pandas as pd
+
+""""
+========================== Filter Sweep =========================
+"""
+
+# class to evaluate many filter configurations of FilteringData.filter_data on the same session table, e.g. for sensitivity studies.
+# Every swept column is sorted once. A predicate value (e.g. energyCutOff = 1) then becomes a searchsorted in the sorted column, and its
+# result is stored as a packed bitmap (1 bit per session). Bitmaps are cached per value, so a configuration is just an AND of a few bitmaps.
+# Filters that do not change within a sweep (card ids, managers) are passed as baseMask, see FilteringData.filter_sweep.
+class FilterSweep:
+    #parameters of filter_data that can be swept, with their defaults in filter_data
+    defaults = {'startTimeFilter': True,
+                'afterStartDate': dt.datetime(2021, 1, 1, 0, 0),
+                'beforeEndDate': dt.datetime(2021, 12, 31, 23, 59),
+                'energyFilter': True,
+                'energyCutOff': 0,
+                'maxDwellTime': None,
+                'minDwellTime': None,
+                'overnightStays': True}
+
+    def __init__(self, sessions, baseMask = None):
+        self.n = len(sessions)
+        start = sessions['start_datetime_utc']
+        end = sessions['end_datetime_utc']
+
+        #(sorted values, row positions in that order) per swept column. Missing values never pass a comparison, so they are left out.
+        self.sortedColumns = {'start': self.sort_column(start.to_numpy(dtype = 'datetime64[ns]').view('int64'), start.isna().to_numpy()),
+                              'energy': self.sort_column(sessions['total_energy'].to_numpy(dtype = float), sessions['total_energy'].isna().to_numpy()),
+                              #same expression as in FilteringData.filter_mask, such that the comparisons give identical results
+                              'dwell': self.sort_column(((end - start)/ np.timedelta64(1, 'h')).to_numpy(dtype = float), (end.isna() | start.isna()).to_numpy())}
+
+        self.baseBitmap = np.packbits(np.ones(self.n, dtype = bool) if baseMask is None else np.asarray(baseMask, dtype = bool))
+        self.sameDayBitmap = np.packbits((start.dt.day == end.dt.day).to_numpy())
+        self.bitmaps = {}
+
+    @staticmethod
+    def sort_column(values, missing):
+        valid = np.flatnonzero(~missing)
+        order = valid[np.argsort(values[valid], kind = 'stable')]
+        return values[order], order
+
+    #packed bitmap of the rows for which column (>= or <=) value holds
+    def bitmap(self, columnName, operator, value):
+        key = (columnName, operator, value)
+        if key not in self.bitmaps:
+            values, order = self.sortedColumns[columnName]
+            if columnName == 'start':
+                value = pd.Timestamp(value).to_datetime64().astype('datetime64[ns]').view('int64')
+            mask = np.zeros(self.n, dtype = bool)
+            if operator == '>=':
+                mask[order[np.searchsorted(values, value, side = 'left'):]] = True
+            else:
+                mask[order[:np.searchsorted(values, value, side = 'right')]] = True
+            self.bitmaps[key] = np.packbits(mask)
+        return self.bitmaps[key]
+
+    #row positions (in the order of the session table) that pass the filters of one configuration. Same keywords as filter_data.
+    def select(self, **configuration):
+        unknown = set(configuration) - set(self.defaults)
+        if unknown:
+            raise ValueError('Filter sweep does not support {}'.format(sorted(unknown)))
+        settings = dict(self.defaults, **configuration)
+
+        bitmaps = [self.baseBitmap]
+        if settings['startTimeFilter'] == True:
+            bitmaps.append(self.bitmap('start', '>=', settings['afterStartDate']))
+            bitmaps.append(self.bitmap('start', '<=', settings['beforeEndDate']))
+        if settings['energyFilter'] == True:
+            bitmaps.append(self.bitmap('energy', '>=', settings['energyCutOff']))
+        if settings['maxDwellTime'] is not None:
+            bitmaps.append(self.bitmap('dwell', '<=', settings['maxDwellTime']))
+        if settings['minDwellTime'] is not None:
+            bitmaps.append(self.bitmap('dwell', '>=', settings['minDwellTime']))
+        if not settings['overnightStays']:
+            bitmaps.append(self.sameDayBitmap)
+
+        packed = np.bitwise_and.reduce(bitmaps) if len(bitmaps) > 1 else bitmaps[0]
+        return np.flatnonzero(np.unpackbits(packed, count = self.n))
+
+    #row positions for each configuration in a list of configurations (dicts with filter_data keywords)
+    def sweep(self, configurations):
+        return [self.select(**configuration) for configuration in configurations]
+
+    #number of sessions left for each configuration
+    def counts(self, configurations):
+        return np.array([len(rows) for rows in self.sweep(configurations)])
+
+    #all combinations of the given parameter values, e.g. grid(energyCutOff = [0, 1, 2], minDwellTime = [None, 10/60])
+    @staticmethod
+    def grid(**parameters):
+        names = list(parameters)
+        return [dict(zip(names, values)) for values in itertools.product(*[parameters[name] for name in names])]
@@ -0,0 +1,114 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+
+""""
+========================== Binned Kernel Density Estimation =========================
+"""
+
+# class to estimate probability density functions with a Gaussian kernel on an equally spaced grid.
+# The values are first linearly binned onto the grid, after which the kernel is applied as a convolution with FFTs.
+# This costs O(n + grid log grid) instead of O(n * grid) for the exact estimate (Series.plot.kde, scipy.stats.gaussian_kde), at a binning error that vanishes for fine grids.
+# The bandwidth is selected per variable (or per car) with Scott's or Silverman's rule, as in gaussian_kde, or fixed by passing a number (in the unit of the values).
+class BinnedKde:
+    def __init__(self, gridSize = 1024, bandwidth = 'scott', cut = 3):
+        if not (bandwidth in ['scott', 'silverman'] or np.isscalar(bandwidth)):
+            raise ValueError("bandwidth should be 'scott', 'silverman' or a number, not {}".format(bandwidth))
+        self.gridSize = gridSize
+        self.bandwidth = bandwidth
+        #the default grid extends cut bandwidths beyond the smallest and largest value
+        self.cut = cut
+
+    #bandwidths for groups with counts values and standard deviations stds (ddof = 1)
+    def bandwidths(self, counts, stds):
+        counts = np.asarray(counts, dtype = float)
+        if self.bandwidth == 'scott':
+            factor = counts**(-1/5)
+        elif self.bandwidth == 'silverman':
+            factor = (counts*3/4)**(-1/5)
+        else:
+            return np.full(counts.shape, float(self.bandwidth))
+        return np.asarray(stds, dtype = float)*factor
+
+    #grid from low to high, extended by cut bandwidths on both sides
+    def grid(self, low, high, bandwidth):
+        return np.linspace(low - self.cut*bandwidth, high + self.cut*bandwidth, self.gridSize)
+
+    #density of values, evaluated on grid (by default covering all values). Returns the grid and the density on it. NaN values are ignored.
+    def density(self, values, grid = None):
+        grid, densities = self.densities(np.zeros(len(values), dtype = int), values, 1, grid)
+        return grid, densities[0]
+
+    #densities of many groups (e.g. cars) at once. codes[i] is the group (0 .. groups-1) of values[i].
+    #All groups share one grid, by default covering all values, and get their own bandwidth.
+    #Returns the grid and an array with one row per group. Groups without a bandwidth (less than 2 distinct values) get NaN.
+    #Values outside a given grid are dropped, i.e. their mass is missing from the density.
+    def densities(self, codes, values, groups, grid = None):
+        values = np.asarray(values, dtype = float)
+        codes = np.asarray(codes)
+        valid = ~np.isnan(values)
+        values, codes = values[valid], codes[valid]
+
+        counts = np.bincount(codes, minlength = groups).astype(float)
+        sums = np.bincount(codes, weights = values, minlength = groups)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            means = sums/counts
+            stds = np.sqrt(np.bincount(codes, weights = (values - means[codes])**2, minlength = groups)/(counts - 1))
+            bandwidths = self.bandwidths(counts, stds)
+        bandwidths[~(bandwidths > 0)] = np.nan
+
+        if grid is None:
+            if len(values) == 0:
+                return np.full(self.gridSize, np.nan), np.full((groups, self.gridSize), np.nan)
+            grid = self.grid(values.min(), values.max(), np.nanmax(bandwidths, initial = 0))
+        grid = np.asarray(grid, dtype = float)
+        with np.errstate(invalid = 'ignore', divide = 'ignore'):
+            return grid, self.smooth(self.bin(codes, values, groups, grid), bandwidths, grid[1] - grid[0])/counts[:, None]
+
+    #linear binning: each value is split over its two neighbouring grid points, proportional to its distance to them. Returns one row of weights per group.
+    def bin(self, codes, values, groups, grid):
+        size = len(grid)
+        position = (values - grid[0])/(grid[1] - grid[0])
+        inside = (position >= 0) & (position <= size - 1)
+        position, codes = position[inside], codes[inside]
+        below = np.minimum(np.floor(position).astype(int), size - 2)
+        fraction = position - below
+        binned = np.bincount(codes*size + below, weights = 1 - fraction, minlength = groups*size)
+        binned += np.bincount(codes*size + below + 1, weights = fraction, minlength = groups*size)
+        return binned.reshape(groups, size)
+
+    #convolve every row of binned with a Gaussian kernel of its bandwidth, using FFTs.
+    #The rows are padded to at least twice the grid size, such that the circular convolution equals the linear one on the grid.
+    def smooth(self, binned, bandwidths, delta):
+        size = binned.shape[1]
+        padded = 1 << int(np.ceil(np.log2(2*size)))
+        #distance of every kernel point to its centre, wrapped around such that negative offsets are at the end
+        offsets = np.arange(padded)
+        offsets = np.minimum(offsets, padded - offsets)
+        distances = np.where(offsets < size, offsets*delta, np.inf)
+        kernels = np.exp(-0.5*(distances[None, :]/bandwidths[:, None])**2)/(bandwidths[:, None]*np.sqrt(2*np.pi))
+        smoothed = np.fft.irfft(np.fft.rfft(binned, padded, axis = 1)*np.fft.rfft(kernels, axis = 1), padded, axis = 1)[:, :size]
+        #FFT round-off can give tiny negative densities
+        return np.maximum(smoothed, 0)
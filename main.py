@@ -67,14 +67,17 @@ trainingData = data.filter_data(startTimeFilter = True,
 
 print(trainingData)
 
-#simple code to get max number of sessions per day
-#init = datetime.datetime(2020, 1, 1, 0, 0)
+#simple code to get max number of sessions per day. Days are slices of the training data sorted by start time, see session_index.py
+#from session_index import SessionIndex
 #maxParallelSessions = 0
-#while init < datetime.datetime(2022, 8, 31, 23, 59):
-#    maxParallelSessions = max(maxParallelSessions, len(trainingData[(trainingData["start_datetime_utc"]>init)&(trainingData["start_datetime_utc"]<init + datetime.timedelta(hours = 24))]))
-#    init = init + datetime.timedelta(hours=24)
+#for day, sessions in SessionIndex(trainingData).windows('D', datetime.datetime(2020, 1, 1, 0, 0), datetime.datetime(2022, 8, 31, 23, 59)):
+#    maxParallelSessions = max(maxParallelSessions, len(sessions))
 #print("max number of sessions per day = ",maxParallelSessions)
 
+# set to True to fit distributions (lognormal, gamma, Weibull, beta, normal, mixture) to energy, start, end and dwell time, over all sessions and per car.
+# Written to distributionFits.csv. Off by default, since it fits every family for every car.
+fitDistributions = False
+
 # for paramtersweep, instantiate percentiles you wanna check.
 percentiles = np.arange(21)
 steps = math.ceil(100/percentiles[-1])
@@ -109,6 +112,13 @@ aggstats.correlation()
 # individual stats per car 
 indstats = aggstats.stats_per_car(carStats)
 
+# distributions fitted to energy, start, end and dwell time, over all sessions and per car, ranked by AIC
+if fitDistributions:
+    distributionFits = aggstats.fit_distributions(perCar = True)
+
+#wait for the figures rendered in the background
+aggstats.figures.flush()
+
 print("Done stats!")
 print("===================================================================================================================================")
 
@@ -131,8 +141,13 @@ filteredData = data.filter_data(startTimeFilter = True,
 
 
 
+#overlapping sessions per car do not work in DEMKit. Report them, see session_validation.py. autoFix = True drops the later of two overlapping sessions.
+validationReport = data.validate_sessions(autoFix = False)
+
 #add columns with end times based on real start times and estimated dwell times
 filteredData = data.online_estimate_end(carStats, dwell = 30*60, constant = 8*3600)
+#estimated end times are kept in aggstats.endTimes. DemkitSessions reads them from there, only the one used in secondary.py is added as a column
+filteredData = aggstats.endTimes.add_columns(filteredData, ['end_smean_dmean'])
 #FIXME untested. Check if edit of where to apply lambda mask is still working in online estimate end.Then clean up.
 """"
 ========================== C7_ parameter sweep =========================
@@ -140,7 +155,7 @@ filteredData = data.online_estimate_end(carStats, dwell = 30*60, constant = 8*36
 #information on estimated start time and dwell time and energy. We sweep over percentiles of energy and the combination start/dwell. 
 # Instanciating demkit sessions data input
 
-sessions = DemkitSessions(dataStats=filteredData, dataReal=filteredData, ScenarioPrefix="C7_")
+sessions = DemkitSessions(dataStats=filteredData, dataReal=filteredData, ScenarioPrefix="C7_", endTimes=aggstats.endTimes)
 
 # make txt files for DEMKit to define sessions. We take count and specs from S07_, and generate a whole bunch of energy/start/end files.
 #FIXME error if multiple sessions per car with default value/estimated value! Make default dynamic (consequtive days with same times for example)
@@ -577,9 +592,14 @@ print("Done Sessions DEMKit!")
 print("===================================================================================================================================")
 
 #write carStats of simulated day to Excel to be able to call for data sweep and measure calculation after DEMKit simulation
-activeCarStats = carStats.loc[carStats['card_id'].isin(sessions.dataReal['card_id'])]
+activeCarStats = carStats.frame().loc[carStats['card_id'].isin(sessions.dataReal['card_id'])]
 activeCarStats.to_excel("carStats.xlsx")
 filteredData.to_excel("filteredData.xlsx")
-carStats.to_excel("allCarStats.xlsx")
+carStats.frame().to_excel("allCarStats.xlsx")
+#ECDFs per car, reload with EcdfStore.load("carEcdfs.npz")
+aggstats.ecdfs.save("carEcdfs.npz")
+if fitDistributions:
+    distributionFits.to_csv("distributionFits.csv", index = False)
+print(aggstats.figures.report())
 # End 
 print('made it till the end daaaahmn')
\ No newline at end of file
@@ -321,11 +321,11 @@ print("=========================================================================
 # surveyData.to_excel
 
 #write carStats of simulated day to Excel to be able to call for data sweep and measure calculation after DEMKit simulation
-#activeCarStats = carStats.loc[carStats['card_id'].isin(sessions.dataReal['card_id'])]
+#activeCarStats = carStats.frame().loc[carStats['card_id'].isin(sessions.dataReal['card_id'])]
 #activeCarStats.to_excel("carStats.xlsx")
 sampleData.to_excel("sampleData_11kW.xlsx")
 mergedData.to_excel("mergedData_11kW.xlsx")
 sampleDataSmart.append(sampleDataFast).to_excel('sampleDataSmartFast_11kW.xlsx')
-carStats.to_excel("allCarStats_11kW.xlsx")
+carStats.frame().to_excel("allCarStats_11kW.xlsx")
 # End 
 print('made it till the end daaaahmn')
\ No newline at end of file
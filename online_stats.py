@@ -0,0 +1,220 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import math
+import random
+import numpy as np
+import pandas as pd
+from filter_data_process import column
+from car_stats import CarStats
+
+""""
+========================== Online Statistics =========================
+"""
+
+# classes to keep the per car statistics up to date as sessions close, instead of recomputing them from the whole history.
+# Every state can be updated per session in (amortized) constant time, and states of parallel workers can be merged.
+
+# mergeable quantile sketch (KLL, Karnin, Lang and Liberty 2016). Holds at most about 3k values, however many values were added.
+# Level h holds values that each represent 2^h added values. When the sketch is full, the lowest full level is sorted and every other value is promoted to the next level.
+# As long as no level was compacted, the sketch holds all values and its quantiles are exact.
+class KllSketch:
+    def __init__(self, k = 200, seed = None):
+        self.k = k
+        self.levels = [[]]
+        self.count = 0
+        #number of stored values, and the sum of the capacities of all levels
+        self.size = 0
+        self.maxSize = k
+        self.random = random.Random(seed)
+
+    #capacity of a level. Lower levels get geometrically less space than the top level.
+    def capacity(self, level):
+        depth = len(self.levels) - level - 1
+        return max(2, int(math.ceil(self.k * (2/3)**depth)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.count += 1
+        self.size += 1
+        if self.size > self.maxSize:
+            self.compress()
+
+    def merge(self, other):
+        for level, values in enumerate(other.levels):
+            if level == len(self.levels):
+                self.add_level()
+            self.levels[level].extend(values)
+        self.count += other.count
+        self.size += other.size
+        self.compress()
+        return self
+
+    def add_level(self):
+        self.levels.append([])
+        self.maxSize = sum(self.capacity(level) for level in range(len(self.levels)))
+
+    #compact the lowest full level until the values fit again
+    def compress(self):
+        while self.size > self.maxSize:
+            for level, values in enumerate(self.levels):
+                if len(values) >= self.capacity(level):
+                    if level + 1 == len(self.levels):
+                        self.add_level()
+                    values.sort()
+                    #with an odd number of values, one stays behind at this level
+                    keep = [values.pop()] if len(values) % 2 else []
+                    promoted = values[self.random.randint(0, 1)::2]
+                    self.levels[level + 1].extend(promoted)
+                    self.levels[level] = keep
+                    self.size -= len(values) - len(promoted)
+                    break
+
+    def exact(self):
+        return len(self.levels) == 1
+
+    #quantiles (fractions between 0 and 1). Linear interpolation as np.percentile while the sketch is exact, otherwise the smallest value whose weighted rank reaches the quantile.
+    def quantiles(self, fractions):
+        fractions = np.asarray(fractions, dtype = float)
+        if self.count == 0:
+            return np.full(fractions.shape, np.nan)
+        if self.exact():
+            return np.percentile(self.levels[0], fractions*100)
+        values = np.concatenate([np.asarray(values, dtype = float) for values in self.levels])
+        weights = np.concatenate([np.full(len(values), 2**level) for level, values in enumerate(self.levels)])
+        order = np.argsort(values)
+        ranks = np.cumsum(weights[order])
+        index = np.minimum(np.searchsorted(ranks, fractions*ranks[-1]), len(values) - 1)
+        return values[order][index]
+
+# count, mean, variance (Welford), min, max and a quantile sketch of one variable
+class RunningStats:
+    def __init__(self, k = 200, seed = None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = np.nan
+        self.max = np.nan
+        self.sketch = KllSketch(k, seed)
+
+    #NaN values are skipped, as in pandas
+    def update(self, value):
+        if value != value:
+            return
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta/self.count
+        self.m2 += delta*(value - self.mean)
+        self.min = value if not self.min <= value else self.min
+        self.max = value if not self.max >= value else self.max
+        self.sketch.update(value)
+
+    #combine with the state of another worker (Chan et al.)
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta**2*self.count*other.count/count
+        self.mean += delta*other.count/count
+        self.count = count
+        self.min = np.fmin(self.min, other.min)
+        self.max = np.fmax(self.max, other.max)
+        self.sketch.merge(other.sketch)
+        return self
+
+    #sample standard deviation, as .describe()
+    def std(self):
+        return math.sqrt(self.m2/(self.count - 1)) if self.count > 1 else np.nan
+
+    #quantiles (fractions between 0 and 1). 0 and 1 give the exact min and max.
+    def quantiles(self, fractions):
+        fractions = np.asarray(fractions, dtype = float)
+        values = self.sketch.quantiles(fractions)
+        return np.where(fractions <= 0, self.min, np.where(fractions >= 1, self.max, values))
+
+# running statistics per car for the energy, start, end and dwell time of their sessions.
+# car_stats() gives the same columns as the *_stats functions of StatisticalAnalysis (count, energy_mean, ..., e<percentile>, s<percentile>, d<percentile>).
+# Quantiles are exact as long as a car has at most k sessions, and approximate (rank error around 1/k) beyond.
+class OnlineCarStats:
+    #as prefix in carStats -> session column, and the prefix of the percentile columns
+    variables = {'energy': 'total_energy_Wh',
+                 'start_time': 'start_datetime_seconds',
+                 'end_time': 'end_datetime_seconds',
+                 'dwell_time': 'dwell_time_seconds'}
+    percentileColumns = {'energy': 'e', 'start_time': 's', 'dwell_time': 'd'}
+
+    def __init__(self, k = 200, seed = None):
+        self.k = k
+        self.random = random.Random(seed)
+        #card_id -> {prefix: RunningStats}, in order of first appearance
+        self.cars = {}
+
+    def car(self, cardID):
+        if cardID not in self.cars:
+            self.cars[cardID] = {prefix: RunningStats(self.k, self.random.random()) for prefix in self.variables}
+        return self.cars[cardID]
+
+    #add one closed session. values maps the session columns in variables (or their prefix) to the value of the session.
+    def update(self, cardID, values):
+        stats = self.car(cardID)
+        for prefix, name in self.variables.items():
+            value = values[name] if name in values else values.get(prefix, np.nan)
+            stats[prefix].update(float(value))
+        return self
+
+    #add sessions, in the order of the frame. Derived columns (e.g. total_energy_Wh) are computed once for the whole frame.
+    def update_sessions(self, sessions):
+        columns = {name: column(sessions, name).to_numpy(dtype = float) for name in self.variables.values()}
+        for row, cardID in enumerate(sessions['card_id'].to_numpy()):
+            self.update(cardID, {name: values[row] for name, values in columns.items()})
+        return self
+
+    #combine with the state of another worker, e.g. one that processed a different set of data files
+    def merge(self, other):
+        for cardID, stats in other.cars.items():
+            for prefix, variable in self.car(cardID).items():
+                variable.merge(stats[prefix])
+        return self
+
+    #CarStats with the current statistics of all cars. percentiles (0-100) adds the e, s and d percentile columns.
+    def car_stats(self, percentiles = None):
+        cardIDs = list(self.cars)
+        carStats = CarStats(cardIDs)
+        quartiles = [0.25, 0.5, 0.75]
+        for prefix in self.variables:
+            stats = [self.cars[cardID][prefix] for cardID in cardIDs]
+            quantiles = np.array([variable.quantiles(quartiles) for variable in stats]).reshape(len(stats), len(quartiles))
+            carStats.add('count', {'count': np.array([variable.count for variable in stats], dtype = float)}, cardIDs, replace = False)
+            carStats.add(prefix, {'{}_mean'.format(prefix): np.array([variable.mean if variable.count else np.nan for variable in stats]),
+                                  '{}_std'.format(prefix): np.array([variable.std() for variable in stats]),
+                                  '{}_min'.format(prefix): np.array([variable.min for variable in stats]),
+                                  '{}_25'.format(prefix): quantiles[:, 0],
+                                  '{}_50'.format(prefix): quantiles[:, 1],
+                                  '{}_75'.format(prefix): quantiles[:, 2],
+                                  '{}_max'.format(prefix): np.array([variable.max for variable in stats])}, cardIDs)
+            if percentiles is not None and prefix in self.percentileColumns:
+                values = np.array([variable.quantiles(np.asarray(percentiles, dtype = float)/100) for variable in stats]).reshape(len(stats), len(percentiles))
+                carStats.add('{}_percentiles'.format(prefix), pd.DataFrame(values, columns = ['{}{}'.format(self.percentileColumns[prefix], p) for p in percentiles]), cardIDs)
+        return carStats
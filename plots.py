@@ -0,0 +1,133 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import scipy
+import seaborn as sns
+from statsmodels.distributions.empirical_distribution import ECDF
+
+""""
+========================== Plots =========================
+"""
+
+# drawing functions of the StatisticalAnalysis figures. Each draws on the figure it gets (see figure_renderer.py) and only depends on its arguments,
+# such that the figures can be rendered in worker processes.
+
+hourTicks = np.arange(0, 28, 4)
+
+#total energy per month, as line or bar plot
+def monthly(figure, months, energy, kind = 'line'):
+    ax = figure.subplots()
+    if kind == 'bar':
+        ax.bar(months, energy, width = 25)
+    else:
+        ax.plot(months, energy, linewidth = 3)
+    ax.set_xlabel('Month')
+    ax.set_ylabel('Monthly energy delivered [MWh]')
+    ax.tick_params(axis = 'x', labelrotation = 45)
+
+def box(figure, values, xlabel, xticks = None):
+    ax = figure.subplots()
+    ax.boxplot(values, vert = False)
+    ax.set_xlabel(xlabel)
+    if xticks is not None:
+        ax.set_xticks(xticks)
+
+def histogram(figure, values, xlabel, ylabel = 'Number of sessions', xticks = None, bins = 100):
+    ax = figure.subplots()
+    ax.hist(values, bins = bins)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if xticks is not None:
+        ax.set_xticks(xticks)
+
+#probability density function on grid (kernel density estimate, see kernel_density.py) with the mean and mean +/- std
+def density(figure, grid, pdf, mean, std, xlabel, xticks = None):
+    ax = figure.subplots()
+    ax.plot(grid, pdf)
+    ax.axvline(x = mean, color = 'r', ls = '--', label = 'mean')
+    ax.axvline(x = mean - std, color = 'b', ls = '--', label = 'std(+/-)')
+    ax.axvline(x = mean + std, color = 'b', ls = '--')
+    ax.legend()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Density')
+    if xticks is not None:
+        ax.set_xticks(xticks)
+
+#histogram with the fitted normal distribution
+def norm_fit(figure, values, xlabel):
+    mu, sigma = scipy.stats.distributions.norm.fit(values)
+    x = np.linspace(mu - 3*sigma, mu + 3*sigma, 200)
+    ax = figure.subplots()
+    ax.hist(values, bins = 100, density = True, label = 'Data')
+    ax.plot(x, scipy.stats.distributions.norm.pdf(x, mu, sigma), 'r-', label = 'Norm pdf (fit)')
+    ax.legend()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Density')
+
+#histogram with the fitted beta distribution, on the values normalized by their L2 norm
+def beta_fit(figure, values, xlabel):
+    values = np.asarray(values, dtype = float)
+    normalized = values/np.linalg.norm(values)
+    a, b, loc, scale = scipy.stats.distributions.beta.fit(normalized)
+    x = np.linspace(scipy.stats.beta.ppf(0.01, a, b), scipy.stats.beta.ppf(0.99, a, b), 100)
+    ax = figure.subplots()
+    ax.hist(normalized, bins = 100, density = True, label = 'Data')
+    ax.plot(x, scipy.stats.distributions.beta.pdf(x, a, b, loc = loc, scale = scale), 'r-', label = 'Beta pdf (fit)')
+    ax.legend()
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Number of sessions')
+
+#empirical cumulative distribution function
+def cdf(figure, values, xlabel, xticks = None):
+    ecdf = ECDF(values)
+    ax = figure.subplots()
+    ax.plot(ecdf.x, ecdf.y, label = 'CDF')
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Probability')
+    if xticks is not None:
+        ax.set_xticks(xticks)
+    ax.legend()
+
+def correlation(figure, corr, labels):
+    ax = figure.subplots()
+    sns.heatmap(corr, cmap = 'viridis_r', ax = ax)
+    ax.set_xticks(np.arange(0, len(labels), 1) + 0.5, labels, rotation = 30)
+    ax.set_yticks(np.arange(0, len(labels), 1) + 0.5, labels, rotation = 45)
+
+#mean and min/25%/50%/75%/max bands of a variable for a few cars. stats has the columns mean, min, 25, 50, 75 and max, one row per car.
+def percentile_bands(figure, stats, ylabel, yticks = None):
+    ax = figure.subplots()
+    x = np.arange(0, len(stats))
+    ax.plot(x, stats['mean'], color = 'r', label = 'Mean')
+    ax.fill_between(x, stats['max'], color = 'gray', alpha = 0.3, label = 'Max')
+    ax.fill_between(x, stats['75'], color = 'gray', alpha = 0.4, label = '75%')
+    ax.fill_between(x, stats['50'], color = 'gray', alpha = 0.6, label = '50%')
+    ax.fill_between(x, stats['25'], color = 'gray', alpha = 0.8, label = '25%')
+    ax.fill_between(x, stats['min'], color = 'black', alpha = 0.2, label = 'Min')
+    ax.legend(loc = 'upper right', fancybox = True, framealpha = 0.5, fontsize = 10)
+    ax.set_ylabel(ylabel)
+    ax.set_xticks(x, ['EV{}'.format(i + 1) for i in x], rotation = 'vertical')
+    if yticks is not None:
+        ax.set_yticks(yticks)
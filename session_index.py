@@ -0,0 +1,77 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import pandas as pd
+
+""""
+========================== Session Index =========================
+"""
+
+# class to select sessions by start time window on a table sorted by start time.
+# A window is found with two binary searches (searchsorted) instead of a scan over all sessions, and is returned as a positional slice,
+# i.e. without copying the data. Walking over all days/weeks/months of a dataset then takes one searchsorted for all window edges.
+class SessionIndex:
+    def __init__(self, sessions, column = 'start_datetime_utc'):
+        #the session store is kept sorted by start time, for other tables (e.g. filtered data) we sort once here.
+        if not sessions[column].is_monotonic_increasing:
+            sessions = sessions.sort_values(by = [column], kind = 'stable', ignore_index = True)
+        self.sessions = sessions
+        self.column = column
+        self.starts = sessions[column].to_numpy(dtype = 'datetime64[ns]')
+
+    @staticmethod
+    def to_datetime64(time):
+        return pd.Timestamp(time).to_datetime64().astype('datetime64[ns]')
+
+    #positions [i, j) of the sessions starting in the window. By default start <= t < end, inclusive = 'both' also includes t == end.
+    def bounds(self, start = None, end = None, inclusive = 'left'):
+        i = 0 if start is None else int(np.searchsorted(self.starts, self.to_datetime64(start), side = 'left'))
+        j = len(self.starts) if end is None else int(np.searchsorted(self.starts, self.to_datetime64(end), side = 'right' if inclusive == 'both' else 'left'))
+        return i, max(i, j)
+
+    #sessions starting in the window, as a slice of the sorted table
+    def window(self, start = None, end = None, inclusive = 'left'):
+        i, j = self.bounds(start, end, inclusive)
+        return self.sessions.iloc[i:j]
+
+    #(window start, sessions) for consecutive windows of a pandas frequency, e.g. 'D' (day), 'W-MON' (week starting monday) or 'MS' (month).
+    #start and end default to the first and last session. Days without sessions give empty slices.
+    def windows(self, freq = 'D', start = None, end = None):
+        if len(self.starts) == 0:
+            return
+        start = pd.Timestamp(self.starts[0] if start is None else start).normalize()
+        end = pd.Timestamp(self.starts[-1] if end is None else end)
+        edges = pd.date_range(start, end, freq = freq, normalize = True)
+        #first edge is the start itself if it does not fall on the frequency, e.g. halfway a week
+        if len(edges) == 0 or edges[0] > start:
+            edges = edges.insert(0, start)
+        edges = edges.append(pd.DatetimeIndex([edges[-1] + pd.tseries.frequencies.to_offset(freq)]))
+        positions = np.searchsorted(self.starts, edges.to_numpy(dtype = 'datetime64[ns]'), side = 'left')
+        for k in range(len(edges) - 1):
+            yield edges[k], self.sessions.iloc[positions[k]:positions[k + 1]]
+
+    #number of sessions starting per window, as a series indexed by window start
+    def counts(self, freq = 'D', start = None, end = None):
+        return pd.Series({windowStart: len(sessions) for windowStart, sessions in self.windows(freq, start, end)}, dtype = int)
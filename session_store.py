@@ -0,0 +1,280 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+import os
+import json
+import shutil
+import hashlib
+from urllib.parse import quote, unquote
+import numpy as np
+import pandas as pd
+from csv_backend import concat_aligned
+
+#feather files can be memory-mapped, which makes reloading the session table close to free.
+#without pyarrow we fall back to pickle files, which still skip the full ETL but are read into memory completely.
+try:
+    import pyarrow.feather as feather
+except ImportError:
+    feather = None
+
+""""
+========================== Session Store =========================
+"""
+
+#columns the session table is sorted by: start time, with ties broken by source and id
+sortColumns = ['start_datetime_utc', 'data_source', 'transaction']
+
+#positions at which the rows with keys newKeys are inserted into the rows with keys, such that the result stays sorted.
+#Both are lists of arrays (one per sortColumn), sorted lexicographically. Only ties on the start time are compared on source and id.
+def insert_positions(keys, newKeys):
+    start, source, transaction = keys
+    newStart, newSource, newTransaction = newKeys
+    positions = np.searchsorted(start, newStart, side = 'left')
+    upper = np.searchsorted(start, newStart, side = 'right')
+    for i in np.flatnonzero(upper > positions):
+        low, high = positions[i], upper[i]
+        later = (source[low:high] > newSource[i]) | ((source[low:high] == newSource[i]) & (transaction[low:high] > newTransaction[i]))
+        positions[i] = low + np.argmax(later) if later.any() else high
+    return positions
+
+#combine session tables that are each sorted by sortColumns into one sorted table.
+#The tables are merged on their keys only, after which the rows are copied once. No full sort is needed.
+def merge_sorted(frames):
+    keys, order, offset = None, None, 0
+    for frame in frames:
+        frameKeys = [frame['start_datetime_utc'].to_numpy(dtype = 'datetime64[ns]').view('int64'), frame['data_source'].to_numpy(), frame['transaction'].to_numpy()]
+        rows = offset + np.arange(len(frame))
+        if keys is None:
+            keys, order = frameKeys, rows
+        else:
+            positions = insert_positions(keys, frameKeys)
+            keys = [np.insert(values, positions, newValues) for values, newValues in zip(keys, frameKeys)]
+            order = np.insert(order, positions, rows)
+        offset += len(frame)
+    return concat_aligned(list(frames), join = 'outer', ignore_index = True).take(order).reset_index(drop = True)
+
+# class to persist the normalized and merged session table in a columnar format.
+# The table is keyed by the content hashes of the source files, so it is rebuilt automatically once an export changes.
+class SessionStore:
+    #bump when the normalization in FilteringData changes, so that stale tables are not reused.
+    version = 6
+    #appended segments per table. Beyond this, the next append writes the whole table again, such that loading does not have to combine ever more files.
+    maxSegments = 32
+
+    def __init__(self, cacheDir = 'cache/'):
+        self.cacheDir = cacheDir
+        if not os.path.isdir(self.cacheDir):
+            os.makedirs(self.cacheDir)
+        #remembers file hashes per (path, size, mtime), such that unchanged files are not rehashed on every call
+        self.hashIndexFile = os.path.join(self.cacheDir, 'fileHashes.json')
+        if os.path.isfile(self.hashIndexFile):
+            with open(self.hashIndexFile, 'r') as f:
+                self.hashIndex = json.load(f)
+        else:
+            self.hashIndex = {}
+        #key of the most recent session table and the watermarks (highest processed session id per source file) it was built up to
+        self.latestFile = os.path.join(self.cacheDir, 'latest.json')
+
+    #sha256 of the file content. Read in blocks to keep memory flat for large exports.
+    def file_hash(self, path):
+        stat = os.stat(path)
+        signature = '{}|{}|{}'.format(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if signature in self.hashIndex:
+            return self.hashIndex[signature]
+
+        sha = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        self.hashIndex[signature] = sha.hexdigest()
+        with open(self.hashIndexFile, 'w') as f:
+            json.dump(self.hashIndex, f)
+        return self.hashIndex[signature]
+
+    #hash of the settings the session table depends on besides the source files (export formats, timezone, ...), given as a json serializable object
+    def settings_hash(self, settings):
+        return hashlib.sha256(json.dumps(settings, sort_keys = True).encode()).hexdigest()
+
+    #key of the session table generated from a list of source files with the given settings. Order of the files matters, since it determines which duplicate is kept.
+    def key(self, dataFiles, settings = None):
+        sha = hashlib.sha256('v{}'.format(self.version).encode())
+        sha.update(self.settings_hash(settings).encode())
+        for path in dataFiles:
+            sha.update(self.file_hash(path).encode())
+        return sha.hexdigest()[:16]
+
+    def path(self, key):
+        if feather is not None:
+            return os.path.join(self.cacheDir, 'sessions_{}.feather'.format(key))
+        return os.path.join(self.cacheDir, 'sessions_{}.pkl'.format(key))
+
+    #Appending (FilteringData(appendMode = True)) stores a table as segments instead: the files of the table it appends to, plus a segment with the appended sessions.
+    #sessions_<key>.json lists the files, which are each sorted by start time. This saves writing the whole table again on every refresh.
+    def manifest_path(self, key):
+        return os.path.join(self.cacheDir, 'sessions_{}.json'.format(key))
+
+    def segment_path(self, key):
+        return os.path.join(self.cacheDir, 'segment_{}{}'.format(key, os.path.splitext(self.path(key))[1]))
+
+    #files (in cacheDir) that hold the table of key, or an empty list if it was not stored.
+    def segments(self, key):
+        if os.path.isfile(self.path(key)):
+            return [os.path.basename(self.path(key))]
+        if os.path.isfile(self.manifest_path(key)):
+            with open(self.manifest_path(key), 'r') as f:
+                return json.load(f)['segments']
+        return []
+
+    #returns the cached session table, or None if it was not generated before for this key.
+    #Note that the card IDs of segments are reconciled with the mapping at the time they were appended, see FilteringData.load_sessions.
+    def load(self, key):
+        segments = self.segments(key)
+        if len(segments) == 0:
+            return None
+        if len(segments) == 1:
+            return self.read(os.path.join(self.cacheDir, segments[0]))
+        return merge_sorted([self.read(os.path.join(self.cacheDir, name)) for name in segments])
+
+    #store the table of key as the files of the table of previousKey plus a segment with sessions, sorted by sortColumns.
+    def save_segment(self, key, previousKey, sessions):
+        segments = self.segments(previousKey)
+        if len(sessions) > 0:
+            path = self.segment_path(key)
+            self.write(path + '.tmp', sessions)
+            os.replace(path + '.tmp', path)
+            segments = segments + [os.path.basename(path)]
+        with open(self.manifest_path(key) + '.tmp', 'w') as f:
+            json.dump({'segments': segments}, f)
+        os.replace(self.manifest_path(key) + '.tmp', self.manifest_path(key))
+
+    def save(self, key, sessions):
+        path = self.path(key)
+        #write to a temporary file first, such that an interrupted run does not leave a corrupted table behind.
+        tmpPath = path + '.tmp'
+        self.write(tmpPath, sessions)
+        os.replace(tmpPath, path)
+
+    def read(self, path, memoryMap = True):
+        if feather is not None:
+            return feather.read_table(path, memory_map = memoryMap).to_pandas()
+        return pd.read_pickle(path)
+
+    def write(self, path, sessions):
+        if feather is not None:
+            feather.write_feather(sessions.reset_index(drop = True), path)
+        else:
+            sessions.to_pickle(path)
+
+    #Partitioned layout (streaming mode, or FilteringData(partitioned = True)): a directory per key with Hive-style partitions
+    #site=<site>/year=<year>/month=<month>/part-<number>.feather, by the site and local start time of the sessions.
+    #Parts are written to a temporary directory, which only replaces the final one once all parts are complete.
+    def parts_dir(self, key, tmp = False):
+        return os.path.join(self.cacheDir, 'sessions_{}{}'.format(key, '.tmp' if tmp else ''))
+
+    #paths of the stored parts, or None if they were not generated before for this key.
+    #Partitions are pruned on their directory names only, before any data is read: sites is a list of sites to keep,
+    #start and end drop the months without any session starting in [start, end].
+    def parts(self, key, tmp = False, sites = None, start = None, end = None):
+        directory = self.parts_dir(key, tmp)
+        if not os.path.isdir(directory):
+            return None
+        sites = None if sites is None else set(str(site) for site in sites)
+        start = None if start is None else pd.Timestamp(start)
+        end = None if end is None else pd.Timestamp(end)
+
+        paths = []
+        for siteDir in sorted(os.listdir(directory)):
+            if sites is not None and unquote(siteDir.split('=', 1)[1]) not in sites:
+                continue
+            for yearDir in sorted(os.listdir(os.path.join(directory, siteDir))):
+                year = int(yearDir.split('=', 1)[1])
+                for monthDir in sorted(os.listdir(os.path.join(directory, siteDir, yearDir))):
+                    monthStart = pd.Timestamp(year, int(monthDir.split('=', 1)[1]), 1)
+                    if start is not None and monthStart + pd.offsets.MonthBegin(1) <= start:
+                        continue
+                    if end is not None and monthStart > end:
+                        continue
+                    partitionDir = os.path.join(directory, siteDir, yearDir, monthDir)
+                    paths += [os.path.join(partitionDir, name) for name in sorted(os.listdir(partitionDir))]
+        return paths
+
+    #split sessions over the partitions and write one part per partition. sites holds the site of each session.
+    def save_part(self, key, number, sessions, sites):
+        directory = self.parts_dir(key, tmp = True)
+        if number == 0 and os.path.isdir(directory):
+            #leftovers of an interrupted run
+            shutil.rmtree(directory)
+        os.makedirs(directory, exist_ok = True)
+
+        start = sessions['start_datetime_utc']
+        extension = os.path.splitext(self.path(key))[1]
+        for (site, year, month), part in sessions.groupby([np.asarray(sites, dtype = str), start.dt.year.to_numpy(), start.dt.month.to_numpy()], sort = True):
+            partitionDir = os.path.join(directory, 'site={}'.format(quote(site, safe = '')), 'year={}'.format(year), 'month={:02d}'.format(month))
+            os.makedirs(partitionDir, exist_ok = True)
+            self.write(os.path.join(partitionDir, 'part-{:05d}{}'.format(number, extension)), part)
+
+    #remove the table and the parts of key, except for the files in keep (segments shared with another table)
+    def remove(self, key, keep = ()):
+        for name in self.segments(key):
+            if name in keep:
+                continue
+            try:
+                os.remove(os.path.join(self.cacheDir, name))
+            except OSError:
+                #on Windows, the table cannot be removed while it is still memory-mapped. Then it is simply left behind.
+                pass
+        if os.path.isfile(self.manifest_path(key)):
+            os.remove(self.manifest_path(key))
+        if os.path.isdir(self.parts_dir(key)):
+            #same for memory-mapped parts
+            shutil.rmtree(self.parts_dir(key), ignore_errors = True)
+
+    #move the parts written under tmpKey (by default key) to key
+    def commit_parts(self, key, tmpKey = None):
+        tmpKey = tmpKey if tmpKey is not None else key
+        if os.path.isdir(self.parts_dir(key)):
+            shutil.rmtree(self.parts_dir(key))
+        os.replace(self.parts_dir(tmpKey, tmp = True), self.parts_dir(key))
+        return self.parts(key)
+
+    #most recent session table, its watermarks and its key. Used to append new sessions instead of rebuilding everything.
+    #Only returned if it was generated with the same settings, see key().
+    def load_latest(self, settings = None):
+        if not os.path.isfile(self.latestFile):
+            return None, {}, None
+        with open(self.latestFile, 'r') as f:
+            latest = json.load(f)
+        if latest.get('version') != self.version or latest.get('settings') != self.settings_hash(settings):
+            return None, {}, None
+        return self.load(latest['key']), latest['watermarks'], latest['key']
+
+    #record key as the most recent session table, after it was saved. The previous table (and its parts) is removed,
+    #such that the cache holds one copy of the sessions instead of one per version of the data files.
+    def save_latest(self, key, watermarks, settings = None):
+        if os.path.isfile(self.latestFile):
+            with open(self.latestFile, 'r') as f:
+                previousKey = json.load(f)['key']
+            if previousKey != key:
+                self.remove(previousKey, keep = self.segments(key))
+        with open(self.latestFile, 'w') as f:
+            json.dump({'key': key, 'version': self.version, 'settings': self.settings_hash(settings), 'watermarks': watermarks}, f)
@@ -0,0 +1,129 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import pandas as pd
+
+""""
+========================== Session Validation =========================
+"""
+
+# class to check a session frame (e.g. the output of filter_data) for sessions DEMKit cannot handle or that point at faulty data:
+# negative dwell times, overlapping and back-to-back sessions of the same car, and chargepoints occupied by two sessions at once.
+# Sessions are sorted once per car (or chargepoint). After that every check is one comparison of shifted arrays, so validation is linear after sorting.
+class SessionValidation:
+    checks = ['negative_dwell', 'car_overlap', 'car_back_to_back', 'chargepoint_overlap']
+
+    #backToBackGap in seconds: a session starting at most this long after the previous session of the same car ended counts as back-to-back
+    def __init__(self, backToBackGap = 60):
+        self.backToBackGap = backToBackGap
+
+    #report with one row per finding. row is the index of the session in sessions, other_row the index of the earlier session it collides with.
+    #overlap_seconds is positive for overlaps and zero or negative (the gap) for back-to-back sessions.
+    def validate(self, sessions):
+        start = sessions['start_datetime_utc']
+        end = sessions['end_datetime_utc']
+        reports = []
+
+        negative = (end < start).to_numpy()
+        reports.append(pd.DataFrame({'check': 'negative_dwell',
+                                     'row': sessions.index[negative],
+                                     'other_row': sessions.index[negative],
+                                     'key': sessions['card_id'].to_numpy()[negative],
+                                     'overlap_seconds': ((start - end)/ np.timedelta64(1, 's')).to_numpy()[negative]}))
+
+        rows, otherRows, overlap = self.sweep(sessions, 'card_id')
+        gap = np.timedelta64(int(self.backToBackGap*1e9), 'ns')
+        for check, found in [('car_overlap', overlap > np.timedelta64(0, 'ns')), ('car_back_to_back', (overlap <= np.timedelta64(0, 'ns')) & (overlap >= -gap))]:
+            reports.append(self.report(sessions, check, 'card_id', rows[found], otherRows[found], overlap[found]))
+
+        #chargepoint_id has the connector suffix removed (see source_adapters.py), and a chargepoint can serve two cars at once. So occupancy is checked per connector (evse_uid) where known.
+        occupancy = sessions['chargepoint_id'].astype(object)
+        if 'evse_uid' in sessions:
+            occupancy = sessions['evse_uid'].astype(object).where(sessions['evse_uid'].notna(), occupancy)
+        occupancy = occupancy.rename('connector')
+        rows, otherRows, overlap = self.sweep(pd.concat([sessions[['start_datetime_utc', 'end_datetime_utc']], occupancy], axis = 1), 'connector')
+        found = overlap > np.timedelta64(0, 'ns')
+        reports.append(self.report(sessions, 'chargepoint_overlap', occupancy, rows[found], otherRows[found], overlap[found]))
+
+        report = pd.concat([frame for frame in reports if len(frame) > 0] or [reports[0]], ignore_index = True)
+        report['start_datetime_utc'] = start.loc[report['row']].to_numpy()
+        report['end_datetime_utc'] = end.loc[report['row']].to_numpy()
+        report['other_end_datetime_utc'] = end.loc[report['other_row']].to_numpy()
+        return report
+
+    #key is the column (or series) the sessions were grouped by
+    def report(self, sessions, check, key, rows, otherRows, overlap):
+        keys = sessions[key] if isinstance(key, str) else key
+        return pd.DataFrame({'check': check,
+                             'row': sessions.index[rows],
+                             'other_row': sessions.index[otherRows],
+                             'key': keys.to_numpy()[rows],
+                             'overlap_seconds': overlap/ np.timedelta64(1, 's')})
+
+    #sorts the sessions by (key, start, end). For every session, finds the latest end among the earlier sessions with the same key.
+    #returns the positions of the sessions, the positions of the earlier sessions with that latest end, and the overlap (latest end - start).
+    def sweep(self, sessions, key):
+        codes = pd.factorize(sessions[key])[0]
+        start = sessions['start_datetime_utc'].to_numpy(dtype = 'datetime64[ns]')
+        end = sessions['end_datetime_utc'].to_numpy(dtype = 'datetime64[ns]')
+        valid = (codes >= 0) & ~np.isnat(start) & ~np.isnat(end)
+        positions = np.flatnonzero(valid)
+        order = positions[np.lexsort((end[positions], start[positions], codes[positions]))]
+        if len(order) < 2:
+            empty = np.array([], dtype = int)
+            return empty, empty, np.array([], dtype = 'timedelta64[ns]')
+        groups = codes[order]
+        sortedEnd = end[order]
+
+        #running maximum of the end time within each group, and the (sorted) position of the session it belongs to
+        runningEnd = pd.Series(sortedEnd).groupby(groups, sort = False).cummax().to_numpy(dtype = 'datetime64[ns]')
+        latest = np.where(sortedEnd == runningEnd, np.arange(len(order)), -1)
+        latest = pd.Series(latest).groupby(groups, sort = False).cummax().to_numpy()
+
+        #compare each session with the running maximum up to the previous session of its group
+        sameGroup = groups[1:] == groups[:-1]
+        rows = order[1:][sameGroup]
+        otherRows = order[latest[:-1][sameGroup]]
+        overlap = runningEnd[:-1][sameGroup] - start[rows]
+        return rows, otherRows, overlap
+
+    #number of findings per check
+    def summary(self, report):
+        return report.groupby('check').size().reindex(self.checks, fill_value = 0)
+
+    #drops the sessions of the given checks: for overlaps the later session, for negative dwell times the session itself.
+    #a session is only dropped for colliding with a session that stays. Sessions that only collided with dropped sessions are checked again in the next pass.
+    def fix(self, sessions, fixChecks = ('negative_dwell', 'car_overlap')):
+        fixed = sessions
+        while True:
+            report = self.validate(fixed)
+            report = report[report['check'].isin(fixChecks)]
+            if len(report) == 0:
+                return fixed
+            drop = (report['check'] == 'negative_dwell') | ~report['other_row'].isin(report['row'])
+            if not drop.any():
+                #collisions only among flagged sessions (equal start times over several checks). Drop all of them.
+                drop[:] = True
+            fixed = fixed.drop(index = pd.unique(report.loc[drop, 'row']))
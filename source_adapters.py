@@ -0,0 +1,167 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import pandas as pd
+from csv_backend import CsvBackend, map_categories
+from timestamp_normalization import TimestampNormalizer
+
+""""
+========================== Source Adapters =========================
+"""
+
+#to make comparable, we use symbols only, not asterixes or dashes in the card_ids.
+#IDs are categorical, so the string operations only run once per unique ID (see map_categories).
+def clean_card_id(ids):
+    return ids.str.replace("-", "", regex = False).str.replace("*", "", regex = False)
+
+# base class of the adapters that map an export format of a charge point operator to the common session columns:
+# transaction (numeric id), chargepoint_id, start_datetime_utc, end_datetime_utc (both local time), card_id and total_energy (kWh).
+# A new export format only needs a subclass that sets schema, required and endColumn and implements ids and normalize, and a call to register_adapter.
+class SourceAdapter:
+    #name to refer to the adapter in FilteringData.dataSchemas
+    name = None
+    #type per column, see csv_backend.py. Columns not listed are inferred by the parser.
+    schema = {}
+    #columns that have to be filled for a session to be complete. Incomplete sessions are dropped.
+    required = []
+    #column that is empty as long as a session is still in progress
+    endColumn = None
+
+    #numeric session id per row. Used to remove duplicates and for the watermarks.
+    def ids(self, rawData):
+        raise NotImplementedError
+
+    #map the complete sessions to the common columns. ids holds the session ids of these rows.
+    def normalize(self, rawData, ids, timestamps):
+        raise NotImplementedError
+
+    #returns the session ids of all rows, and the complete sessions with id > watermark in the common columns.
+    #source is the position of the data file in FilteringData.dataFiles. Duplicates are resolved in favour of the first data file.
+    def sessions(self, rawData, timestamps, watermark = -1, source = 0):
+        ids = self.ids(rawData)
+
+        #selected filters to delete incomplete data points, and only keep sessions we did not process before
+        complete = rawData[self.required].notnull().all(axis = 1)
+        rawData = rawData[complete & (ids > watermark)].copy()
+
+        rawData = self.normalize(rawData, ids.loc[rawData.index], timestamps)
+        rawData['data_source'] = source
+        return ids, rawData
+
+    #highest id such that all sessions with lower or equal id had ended. Sessions still in progress are picked up again in a later refresh.
+    def watermark(self, rawData, ids):
+        ended = rawData[self.endColumn].notnull()
+        if len(ids) == 0:
+            return -1
+        if (~ended).any():
+            return int(ids[~ended].min()) - 1
+        return int(ids.max())
+
+# transaction export. Has columns ['transaction', 'chargepoint_id', 'start_datetime_utc', 'end_datetime_utc', 'card_id', 'total_energy']
+class TransactionsAdapter(SourceAdapter):
+    name = 'transactions'
+    schema = {'transaction': 'int64',
+              'chargepoint_id': 'category',
+              'start_datetime_utc': 'timestamp',
+              'end_datetime_utc': 'timestamp',
+              'card_id': 'category',
+              'total_energy': 'float64'}
+    required = ['start_datetime_utc', 'end_datetime_utc', 'total_energy', 'card_id']
+    endColumn = 'end_datetime_utc'
+
+    def ids(self, rawData):
+        return rawData['transaction']
+
+    def normalize(self, rawData, ids, timestamps):
+        #dates are utc. They are converted to Dutch local time (+1 CET in winter, +2 CEST in summer), see timestamp_normalization.py.
+        rawData['start_datetime_utc'] = timestamps.from_utc(rawData['start_datetime_utc'])
+        rawData['end_datetime_utc'] = timestamps.from_utc(rawData['end_datetime_utc'])
+        rawData['card_id'] = map_categories(rawData['card_id'], clean_card_id)
+        return rawData
+
+# LMS session export. Has columns ['session_id','session_start_datetime','session_end_datetime','session_kwh','session_auth_id','session_auth_method','connector_id','connector_standard','connector_format','evse_uid','evse_id','location_id','location_name','location_address','location_city','location_postal_code','location_latitude','location_longitude]
+class LmsSessionsAdapter(SourceAdapter):
+    name = 'lms_sessions'
+    #connector_id and location_postal_code are left to the parser, they are numeric in the exports.
+    schema = {'session_id': 'string',
+              'session_start_datetime': 'timestamp',
+              'session_end_datetime': 'timestamp',
+              'session_kwh': 'float64',
+              'session_auth_id': 'category',
+              'session_auth_method': 'category',
+              'connector_standard': 'category',
+              'connector_format': 'category',
+              'evse_uid': 'category',
+              'evse_id': 'category',
+              'location_id': 'category',
+              'location_name': 'category',
+              'location_address': 'category',
+              'location_city': 'category',
+              'location_latitude': 'float64',
+              'location_longitude': 'float64'}
+    required = ['session_start_datetime', 'session_end_datetime', 'session_kwh', 'session_auth_id']
+    endColumn = 'session_end_datetime'
+
+    def ids(self, rawData):
+        return pd.to_numeric(rawData['session_id'].str.replace("NLLMS", "", regex = False), errors = 'coerce').fillna(-1).astype('int64')
+
+    def normalize(self, rawData, ids, timestamps):
+        #dates are local time including the utc offset. Save offset in rawData['start_utc_offset'] and rawData['end_utc_offset'].
+        rawData['start_datetime_utc'], rawData['start_utc_offset'] = timestamps.from_offset(rawData['session_start_datetime'])
+        rawData['end_datetime_utc'], rawData['end_utc_offset'] = timestamps.from_offset(rawData['session_end_datetime'])
+        #the original columns hold the local time without offset, as they did before the typed parsing
+        rawData['session_start_datetime'] = rawData['start_datetime_utc']
+        rawData['session_end_datetime'] = rawData['end_datetime_utc']
+
+        rawData['total_energy'] = rawData['session_kwh']
+        rawData['card_id'] = map_categories(rawData['session_auth_id'], clean_card_id)
+
+        # added this to remove *1 and *2 from evse_uid!
+        rawData['chargepoint_id'] = map_categories(rawData['evse_uid'], lambda ids: ids.str.split('*').str[0])
+
+        # added this to avoid having NaN Values in the cluster analysis!
+        rawData['transaction'] = ids
+        return rawData
+
+#registry of all known export formats, by name
+adapters = {}
+
+def register_adapter(adapter):
+    adapters[adapter.name] = adapter
+    return adapter
+
+def get_adapter(name):
+    if name not in adapters:
+        raise ValueError('No source adapter registered for {}. Known are {}'.format(name, sorted(adapters)))
+    return adapters[name]
+
+register_adapter(TransactionsAdapter())
+register_adapter(LmsSessionsAdapter())
+
+#parses and normalizes one data file. Module level, such that it can run in a worker process.
+#returns the normalized sessions with id > watermark and the new watermark of the file.
+def ingest(path, adapter, source = 0, watermark = -1, timezone = 'Europe/Amsterdam'):
+    rawData = CsvBackend().read(path, adapter.schema)
+    ids, sessions = adapter.sessions(rawData, TimestampNormalizer(timezone), watermark, source)
+    return sessions, adapter.watermark(rawData, ids)
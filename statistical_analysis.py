@@ -21,35 +21,187 @@
 #    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
 #    USA
 
-import itertools
 import pandas as pd
-import datetime
-import os
 import numpy as np
-from matplotlib import pyplot
-from statsmodels.distributions.empirical_distribution import ECDF
-import math
-import scipy
-import seaborn as sns; # sns.set_theme()
+import plots
+from filter_data_process import column
+from artifact_sink import ArtifactSink
+from ecdf_store import EcdfStore
+from end_time_grid import EndTimeGrid
+from car_stats import CarStats
+from online_stats import OnlineCarStats
+from windowed_stats import WindowedCarStats
+from figure_renderer import FigureRenderer
+from kernel_density import BinnedKde
+from distribution_fitting import DistributionFitter
 
 """"
 ========================== Statistical Analysis =========================
 """
 
 class StatisticalAnalysis:
-    def __init__(self, data, carStats=None):  
+    #artifacts decides where and how global_statistics_summary.csv is written and whether the overview is printed, see artifact_sink.py
+    #figures renders the figures of the *_plots functions, by default in parallel worker processes, see figure_renderer.py. Call figures.flush() to wait for them.
+    def __init__(self, data, carStats=None, artifacts=None, figures=None):  
         self.data = data
+        self.artifacts = artifacts if artifacts is not None else ArtifactSink()
+        self.figures = figures if figures is not None else FigureRenderer()
+        #kernel density estimates of the pdf-* figures and car_densities()
+        self.kde = BinnedKde()
         
         # =============================================================================================================
         #holy grail. Per column, determines count, mean, std, min, 25%, 50%, 75%, max. Saves in dataframe. 
         #only works on numerical values
         self.global_statistics_summary = self.data.describe()
-        print(self.data.shape)
-        print(self.data.info())
-        print(self.data.describe())
-        self.global_statistics_summary.to_csv('global_statistics_summary.csv',index=True) 
+        self.artifacts.log(self.data.shape, self.data.info, self.global_statistics_summary)
+        self.artifacts.write(self.global_statistics_summary, 'global_statistics_summary.csv', index=True)
         #https://medium.com/analytics-vidhya/statistical-analysis-in-python-using-pandas-27c6a4209de2
 
+        #per car statistics of all variables, computed once on the first call of one of the *_stats functions, see car_description()
+        self.carDescription = None
+        self.carCodes = None
+        #ECDFs per car of the energy (kWh), start, end and dwell time (hours), filled by the *_stats functions, see ecdf_store.py
+        self.ecdfs = None
+        #estimated end times per car for combinations of start and dwell time estimates, filled by dwell_time_stats
+        self.endTimes = None
+
+    """"
+    ========================== statistics per car (shared by the *_stats functions). =========================
+    """
+
+    #variables described per car, as prefix in carStats -> session column
+    carVariables = {'energy': 'total_energy_Wh',
+                    'start_time': 'start_datetime_seconds',
+                    'end_time': 'end_datetime_seconds',
+                    'dwell_time': 'dwell_time_seconds',
+                    'power_average': 'average_power_W'}
+
+    #count, mean, std, min, 25%, 50%, 75% and max of all carVariables per car, i.e. what .describe() gives on the sessions of each car.
+    #All cars and variables are aggregated in a single groupby pass over the data instead of masking the data once per car.
+    #One row per card ID, in order of first appearance as pd.unique(data['card_id']). Columns are named <prefix>_<statistic>.
+    def car_description(self):
+        if self.carDescription is not None:
+            return self.carDescription
+        #codes[i] is the row of session i in the description
+        self.carCodes, cardIDs = pd.factorize(self.data['card_id'], use_na_sentinel = False)
+        values = pd.DataFrame({prefix: column(self.data, name).to_numpy(dtype = float) for prefix, name in self.carVariables.items()})
+        grouped = values.groupby(self.carCodes, sort = True)
+        aggregates = grouped.agg(['count', 'mean', 'std', 'min', 'max'])
+        #linear interpolation, as in .describe()
+        quartiles = grouped.quantile([0.25, 0.5, 0.75]).unstack()
+
+        description = {'card_id': cardIDs}
+        for prefix in self.carVariables:
+            description['{}_count'.format(prefix)] = aggregates[(prefix, 'count')].to_numpy(dtype = float)
+            for statistic in ['mean', 'std', 'min']:
+                description['{}_{}'.format(prefix, statistic)] = aggregates[(prefix, statistic)].to_numpy()
+            for quartile in [0.25, 0.5, 0.75]:
+                description['{}_{}'.format(prefix, int(quartile*100))] = quartiles[(prefix, quartile)].to_numpy()
+            description['{}_max'.format(prefix)] = aggregates[(prefix, 'max')].to_numpy()
+        self.carDescription = pd.DataFrame(description)
+        self.ecdfs = EcdfStore(cardIDs)
+        return self.carDescription
+
+    #describe() stats of one variable as columns for carStats: count, <prefix>_mean, <prefix>_std, <prefix>_min, <prefix>_25, <prefix>_50, <prefix>_75, <prefix>_max
+    def car_stats_columns(self, prefix):
+        description = self.car_description()
+        stats = pd.DataFrame({'count': description['{}_count'.format(prefix)]})
+        for statistic in ['mean', 'std', 'min', '25', '50', '75', 'max']:
+            stats['{}_{}'.format(prefix, statistic)] = description['{}_{}'.format(prefix, statistic)]
+        return stats
+
+    #carStats container for the cars in the data. An input carStats (CarStats, or a carStats frame) is augmented, if it holds exactly the same cars.
+    def car_stats(self, carStats = None):
+        cardIDs = self.car_description()['card_id']
+        if carStats is None:
+            return CarStats(cardIDs)
+        print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object.')
+        if isinstance(carStats, pd.DataFrame):
+            carStats = CarStats.from_frame(carStats)
+        carStats.check(cardIDs)
+        return carStats
+
+    #online backend: running statistics per car of the data, which can then be updated per closed session (and merged with those of other workers)
+    #without recomputing the history. Its car_stats() gives the same columns as the *_stats functions, see online_stats.py
+    def online_car_stats(self, k = 200, seed = None):
+        return OnlineCarStats(k, seed).update_sessions(self.data)
+
+    #statistics per car over recent sessions only: the last lastSessions sessions, the last lastWeeks weeks or exponentially decaying weights with halfLife.
+    #Move the window with advance(end), e.g. once per test day, then car_stats() gives the carStats columns for that day. See windowed_stats.py
+    def windowed_car_stats(self, lastSessions = None, lastWeeks = None, halfLife = None, percentiles = None):
+        return WindowedCarStats(self.data, lastSessions, lastWeeks, halfLife, percentiles)
+
+    #add the describe() stats of a variable to carStats. All variables share the count column, which is only added once.
+    def add_description(self, carStats, prefix):
+        stats = self.car_stats_columns(prefix)
+        cardIDs = self.car_description()['card_id']
+        carStats.add('count', stats[['count']], cardIDs, replace = False)
+        carStats.add(prefix, stats.drop(columns = 'count'), cardIDs)
+
+    #add the ECDFs per car of a session column to the ECDF store
+    def car_ecdfs(self, prefix, name):
+        self.car_description()
+        self.ecdfs.add(prefix, self.carCodes, column(self.data, name).to_numpy(dtype = float))
+
+    #probability density functions per car of a session column, estimated with a binned KDE (see kernel_density.py) with a bandwidth per car.
+    #Returns the grid shared by all cars (by default covering all sessions) and the densities on it, one row per car in the order of car_description().
+    def car_densities(self, name, grid = None):
+        self.car_description()
+        return self.kde.densities(self.carCodes, column(self.data, name).to_numpy(dtype = float), len(self.carDescription), grid)
+
+    #density plot of values: the kernel density estimate with the mean and std of values
+    def density_plot(self, folder, name, values, xlabel, xticks = None):
+        grid, pdf = self.kde.density(values)
+        self.figures.submit(folder, name, plots.density, grid, pdf, np.nanmean(values), np.nanstd(values, ddof = 1), xlabel, xticks = xticks)
+
+    #variables fitted by fit_distributions(), as name -> session column. In kWh and hours, the units of the figures
+    fitVariables = {'energy': 'total_energy',
+                    'start_time': 'start_datetime_hours',
+                    'end_time': 'end_datetime_hours',
+                    'dwell_time': 'dwell_time_hours'}
+
+    #fit the distribution families of fitter (see distribution_fitting.py) to fitVariables (or a list of their names), over all sessions and with perCar = True also per car.
+    #Returns one row per variable, car (NaN for the fits on all sessions) and family, ranked per variable and car.
+    def fit_distributions(self, fitter = None, variables = None, perCar = False):
+        fitter = fitter if fitter is not None else DistributionFitter()
+        variables = variables if variables is not None else list(self.fitVariables)
+        samples = []
+        for variable in variables:
+            values = column(self.data, self.fitVariables[variable]).to_numpy(dtype = float)
+            samples.append(({'variable': variable, 'card_id': np.nan}, values))
+            if perCar:
+                #sort once by car and split at the group offsets instead of masking the data per car
+                cardIDs = self.car_description()['card_id']
+                counts = np.bincount(self.carCodes, minlength = len(cardIDs))
+                carValues = np.split(values[np.argsort(self.carCodes, kind = 'stable')], np.cumsum(counts)[:-1])
+                samples += [({'variable': variable, 'card_id': cardID}, sessions) for cardID, sessions in zip(cardIDs, carValues)]
+        return fitter.fit(samples)
+
+    #percentiles of a session column per car, as np.percentile (linear interpolation) on the sessions of each car. One row per car in the order of car_description(), one column per percentile.
+    #The sessions are sorted once by (car, value), after which all percentiles of all cars are read from the sorted values with index arithmetic on the group offsets.
+    #The cost is dominated by the sort, so it hardly depends on the number of percentiles.
+    def car_percentiles(self, name, percentiles):
+        self.car_description()
+        values = column(self.data, name).to_numpy(dtype = float)
+        counts = np.bincount(self.carCodes, minlength = len(self.carDescription))
+        offsets = np.concatenate([[0], np.cumsum(counts)[:-1]])
+        #as np.percentile, a car with any NaN value gets NaN for all percentiles
+        hasNaN = np.bincount(self.carCodes, weights = np.isnan(values), minlength = len(self.carDescription)) > 0
+        values = values[np.lexsort((values, self.carCodes))]
+
+        #virtual index of every percentile within every car, shape (cars, percentiles)
+        positions = (counts[:, None] - 1) * (np.asarray(percentiles, dtype = float)[None, :] / 100)
+        below = np.floor(positions)
+        fraction = positions - below
+        below = below.astype(int)
+        above = np.minimum(below + 1, counts[:, None] - 1)
+        low = values[offsets[:, None] + below]
+        high = values[offsets[:, None] + above]
+        #same interpolation as numpy, which interpolates from the nearest neighbour for numerical stability
+        result = np.where(fraction >= 0.5, high - (high - low) * (1 - fraction), low + (high - low) * fraction)
+        result[hasNaN] = np.nan
+        return result
+
 
     """"
     ========================== statistical analysis of the energy demand (overall and per car). =========================
@@ -58,192 +210,66 @@ class StatisticalAnalysis:
     def energy_demand_plots(self):
         data = self.data
         folder = "Energy_demand/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
+        figures = self.figures
 
         # Plot energy consumption through time at a.s.r. df
-
-        montly_average_energy_consumption = data.groupby(pd.PeriodIndex(data['start_datetime_utc'], freq="M"))['total_energy'].mean().to_frame().reset_index()
         montly_total_energy_consumption = data.groupby(pd.PeriodIndex(data['start_datetime_utc'], freq="M"))['total_energy'].sum().to_frame().reset_index()
         montly_total_energy_consumption['start_datetime_utc'] = montly_total_energy_consumption['start_datetime_utc'].dt.to_timestamp()
-      
-
-        pyplot.figure("energy_whole_period")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.figure(figsize=(10, 8))
-        pyplot.plot(montly_total_energy_consumption['start_datetime_utc'], montly_total_energy_consumption['total_energy']/1000, linewidth=3)
-        #pyplot.plot(montly_average_energy_consumption.values)
-        pyplot.xlabel('Month')
-        pyplot.ylabel('Monthly energy delivered [MWh]')
-        pyplot.xticks(rotation=45)
-        pyplot.savefig(figures_dir +"energy_whole_period.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("energy_whole_period"))
-
-
-        pyplot.figure("energy_whole_period_2")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.figure(figsize=(10, 8))
-        pyplot.bar(montly_total_energy_consumption['start_datetime_utc'], montly_total_energy_consumption['total_energy']/1000, width = 25)
-        #pyplot.plot(montly_average_energy_consumption.values)
-        pyplot.xlabel('Month')
-        pyplot.ylabel('Monthly energy delivered [MWh]')
-        pyplot.xticks(rotation=45)
-        pyplot.savefig(figures_dir +"energy_whole_period_2.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("energy_whole_period_2"))
-        
-        # plot boxes diagram
-        pyplot.figure("box_energy")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.boxplot(data['total_energy'], vert = False)
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.savefig(figures_dir +"box_energy.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("box_energy"))
-
+        months = montly_total_energy_consumption['start_datetime_utc'].to_numpy()
+        monthlyEnergy = montly_total_energy_consumption['total_energy'].to_numpy()/1000
+        figures.submit(folder, "energy_whole_period.pdf", plots.monthly, months, monthlyEnergy, figsize = (10, 8))
+        figures.submit(folder, "energy_whole_period_2.pdf", plots.monthly, months, monthlyEnergy, kind = 'bar', figsize = (10, 8))
 
+        energy = data['total_energy'].to_numpy()
+        # plot boxes diagram
+        figures.submit(folder, "box_energy.pdf", plots.box, energy, 'Energy charged [kWh]')
         #plot histogramm
-        pyplot.figure("Histogram_energy")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['total_energy'],bins = 100)
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.savefig(figures_dir +"Histogram_energy.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("Histogram_energy"))
-
-
+        figures.submit(folder, "Histogram_energy.pdf", plots.histogram, energy, 'Energy charged [kWh]')
         #plot probability density function
-        mean = data['total_energy'].mean()
-        std = data['total_energy'].std()
-
-        pyplot.figure("pdf-energy")
-        pyplot.rcParams['font.size'] = '16'
-        a = data['total_energy'].plot.kde()
-
-        pyplot.axvline(x=mean, color='r', ls='--', label='mean')
-        pyplot.axvline(x=mean-std, color='b', ls='--', label='std(+/-)')
-        pyplot.axvline(x=mean+std, color='b', ls='--')
-        pyplot.legend()
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.ylabel('Density')
-        pyplot.savefig(figures_dir +"pdf-energy.pdf", bbox_inches = "tight")
-
-
-        # plot fitiing pdf norm
-        mu, sigma = scipy.stats.distributions.norm.fit(data['total_energy'])
-        x = np.linspace(mu-3*sigma, mu+3*sigma, 200)
-        fitted_data = scipy.stats.distributions.norm.pdf(x, mu, sigma)
-        pyplot.figure("fitting-pdf-energy-norm")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['total_energy'], bins=100, density=True, label='Data')
-        pyplot.plot(x,fitted_data,'r-', label='Norm pdf (fit)')
-        pyplot.legend()
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.ylabel('Density')
-        pyplot.savefig(figures_dir +"fitting-pdf-energy-norm.pdf", bbox_inches = "tight")
-
-
-        # plot fitiing pdf beta
-        data_norm = data['total_energy']/np.linalg.norm(data['total_energy'])
-
-        a, b, loc, scale = scipy.stats.distributions.beta.fit(data_norm)
-        x = np.linspace(scipy.stats.beta.ppf(0.01, a, b), scipy.stats.beta.ppf(0.99, a, b),100)
-        fitted_data = scipy.stats.distributions.beta.pdf(x, a, b, loc=loc, scale=scale)
-        pyplot.figure("fitting-pdf-energy-beta")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data_norm, bins=100, density=True, label='Data')
-        pyplot.plot(x,fitted_data,'r-', label='Beta pdf (fit)')
-        locs, labels = pyplot.xticks()
-        pyplot.legend()
-        #pyplot.xticks(locs, ['', '0', '20', '40', '60', '80', '100', '120', '140', ''])
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.savefig(figures_dir +"fitting-pdf-energy-beta.pdf", bbox_inches = "tight")
-
-
+        self.density_plot(folder, "pdf-energy.pdf", energy, 'Energy charged [kWh]')
+        # plot fitiing pdf norm and beta
+        figures.submit(folder, "fitting-pdf-energy-norm.pdf", plots.norm_fit, energy, 'Energy charged [kWh]')
+        figures.submit(folder, "fitting-pdf-energy-beta.pdf", plots.beta_fit, energy, 'Energy charged [kWh]')
         #determine empirical cumulative density function of energy demand. I.e. ecdf(x) = P(energy demand <=x)
-        pyplot.figure("cdf-energy")
-        pyplot.rcParams['font.size'] = '16'
-        ecdf = ECDF(data['total_energy'])
-        pyplot.plot(ecdf.x, ecdf.y, label='CDF')
-        pyplot.xlabel('Energy charged [kWh]')
-        pyplot.ylabel('Probability')
-        pyplot.legend()
-        pyplot.savefig(figures_dir +"cdf-energy.pdf", bbox_inches = "tight")
+        figures.submit(folder, "cdf-energy.pdf", plots.cdf, energy, 'Energy charged [kWh]')
 
     #per car, we estimate the maximum power by the maximum of the average charging power per session. 
     #exact if a car at some point ended a greedy session while still in the process of charging.
     def power_estimation_stats(self,carStats = None, powerDefault = 0, capacityDefault = 100000):
-        data = self.data
         #we start analyzing data per unique car, identified by their card ID. 
-        #dataframe with all unique card ids in the dataset
-        cardIDs = pd.unique(self.data['card_id'])
-        
-        #placeholder for data we will generate per car. First column will be the card_ids as unique identifier.
-        if carStats is not None:
-            print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object. Note that in the current configuation the column card_id is being redefined. Make sure that the data inputted in the function is the same as when the carStats object was created to prevent faulty bookkeeping.')
-        else:
-            carStats = pd.DataFrame()
-        
-        #FIXME check if input carStats non-empty whether need to append. Now assuming that all functions get the same data input
-        carStats['card_id'] = cardIDs
-        carStats['power_default'] = powerDefault
-        carStats['capacity_default'] = capacityDefault
-
-        statsMatrix = np.empty([0,1])        
-        for car in carStats['card_id']:
-            maxAverage = max(data['average_power_W'][data['card_id']==car])
-            statsMatrix = np.vstack([statsMatrix, max(powerDefault, maxAverage)])
+        carStats = self.car_stats(carStats)
+        cars = len(carStats)
+
+        #maximum of the average power per car, from the per car description
+        statsMatrix = np.fmax(powerDefault, self.car_description()['power_average_max'].to_numpy())
         
-        #add stats columns to dataframe carStats
-        carStats = pd.concat([carStats, pd.DataFrame(data = statsMatrix, index = None, columns = ['power_max_average_W'])], axis=1)
+        #add stats columns to carStats
+        carStats.add('power', {'power_default': np.full(cars, powerDefault), 'capacity_default': np.full(cars, capacityDefault), 'power_max_average_W': statsMatrix}, self.car_description()['card_id'])
         return carStats
 
     def energy_demand_stats(self, carStats = None, percentiles = None):
-        data = self.data
-        
         #we start analyzing data per unique car, identified by their card ID. 
-        #dataframe with all unique card ids in the dataset
-        cardIDs = pd.unique(self.data['card_id'])
-        
-        #placeholder for data we will generate per car. First column will be the card_ids as unique identifier.
-        if carStats is not None:
-            print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object. Note that in the current configuation the column card_id is being redefined. Make sure that the data inputted in the function is the same as when the carStats object was created to prevent faulty bookkeeping.')
-        else:
-            carStats = pd.DataFrame()
-        #FIXME check if input carStats non-empty whether need to append. Now assuming that all functions get the same data input
-        carStats['card_id'] = cardIDs
+        #new columns are added to carStats with a check that they belong to the same cars, see car_stats.py
+        carStats = self.car_stats(carStats)
 
         #get all statistical data with respect to "variable under analysis" per individual car and put them in carStats dataframe
-        #for easy conversion, we first save the output of pd.dataframe.describe() per car in the row of a numpy array
-        statsMatrix = np.empty([0,8])
-
-        #per car, generate .describe() stats
-        for car in carStats['card_id']:
-            statsMatrix = np.vstack([statsMatrix, data[data['card_id'] == car].describe()['total_energy_Wh'].to_numpy()])
-        
-        #statsMatrix might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
-        energyStats = pd.DataFrame(data = statsMatrix, index = None, columns = ['count', 'energy_mean', 'energy_std', 'energy_min', 'energy_25', 'energy_50', 'energy_75', 'energy_max'])
-        #add stats columns to dataframe carStats
-        carStats = pd.concat([carStats,energyStats], axis=1)
+        #the .describe() stats of all cars are computed at once, see car_description()
+        #stats might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
+        self.add_description(carStats, 'energy')
 
         #create empirical cumulative distribution function per car based on total energy.
         #this approach does not work with start times, since datetime objects cannot be compared to integers using ">".
-        statsList = []
-        for car in carStats['card_id']:
-            statsList = statsList + [ECDF(data[data['card_id'] == car]['total_energy'])]
-        carStats['energy_ecdf'] = statsList
+        #kept in self.ecdfs (not in carStats), e.g. self.ecdfs.cdf('energy', points) evaluates them for all cars at once
+        self.car_ecdfs('energy', 'total_energy')
 
         #for parameter sweep, we hold open the option to add percentiles of the data
         if percentiles is not None:
-            percentileMatrix = np.empty([0,len(percentiles)])
-            #checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
-            for car in carStats['card_id']:
-                percentileMatrix = np.vstack([percentileMatrix, np.percentile(data[data['card_id'] ==car]['total_energy_Wh'], percentiles)])
+            #all percentiles of all cars at once, see car_percentiles(). Checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
+            percentileMatrix = self.car_percentiles('total_energy_Wh', percentiles)
             headers = []
             for i in range(0,len(percentiles)):
                 headers = headers + ['e{}'.format(percentiles[i])]
-            start_percentiles = pd.DataFrame(data = percentileMatrix, index = None, columns = headers)
-            carStats = pd.concat([carStats,start_percentiles],axis=1)
+            carStats.add('energy_percentiles', pd.DataFrame(data = percentileMatrix, index = None, columns = headers), self.car_description()['card_id'])
         
         return carStats
 
@@ -252,144 +278,42 @@ class StatisticalAnalysis:
     """
 
     def start_time_plots(self):
-        data = self.data
         folder = "Start_time/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
+        figures = self.figures
+        startTimes = column(self.data, 'start_datetime_hours').to_numpy()
 
         # plot boxes diagram
-        pyplot.figure("box_starttime")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.boxplot(data['start_datetime_hours'], vert = False)
-        pyplot.xlabel('Start time [h]')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"box_starttime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("box_starttime"))
-
+        figures.submit(folder, "box_starttime.pdf", plots.box, startTimes, 'Start time [h]', xticks = plots.hourTicks)
         #plot histogramm
-        pyplot.figure("Histogram_starttime")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['start_datetime_hours'],bins = 100)
-        pyplot.xlabel('Start time [h]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"Histogram_starttime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("Histogram_starttime"))
-
-
+        figures.submit(folder, "Histogram_starttime.pdf", plots.histogram, startTimes, 'Start time [h]', xticks = plots.hourTicks)
         #plot probability density function
-        mean = data['start_datetime_hours'].mean()
-        std = data['start_datetime_hours'].std()
-
-        pyplot.figure("pdf-starttime")
-        pyplot.rcParams['font.size'] = '16'
-        a = (data['start_datetime_hours']).plot.kde()
-        pyplot.axvline(x=mean, color='r', ls='--', label='mean')
-        pyplot.axvline(x=mean-std, color='b', ls='--', label='std(+/-)')
-        pyplot.axvline(x=mean+std, color='b', ls='--')
-        pyplot.legend()
-        pyplot.xlabel('Arrival time [h]')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.ylabel('Density')
-        pyplot.savefig(figures_dir +"pdf-starttime.pdf")
-
-
-
-        # plot fitiing pdf norm
-        mu, sigma = scipy.stats.distributions.norm.fit(data['start_datetime_hours'])
-        x = np.linspace(mu-3*sigma, mu+3*sigma, 200)
-        fitted_data = scipy.stats.distributions.norm.pdf(x, mu, sigma)
-        pyplot.figure("fitting-pdf-starttime-norm")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['start_datetime_hours'], bins=100, density=True, label='Data')
-        pyplot.plot(x,fitted_data,'r-', label='Norm pdf (fit)')
-        pyplot.legend()
-        pyplot.xlabel('Arrival time [h]')
-        pyplot.ylabel('Density')
-        pyplot.savefig(figures_dir +"fitting-pdf-starttime-norm.pdf",bbox_inches = "tight")
-
-
-        # plot fitiing pdf beta
-        data_norm = data['start_datetime_hours']/np.linalg.norm(data['start_datetime_hours'])
-
-        a, b, loc, scale = scipy.stats.distributions.beta.fit(data_norm)
-        
-        x = np.linspace(scipy.stats.beta.ppf(0.01, a, b), scipy.stats.beta.ppf(0.99, a, b),100)
-        
-        fitted_data = scipy.stats.distributions.beta.pdf(x, a, b, loc=loc, scale=scale)
-        pyplot.figure("fitting-pdf-starttime-beta")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data_norm, bins=100, density=True, label='Data')
-        pyplot.plot(x,fitted_data,'r-', label='Beta pdf (fit)')
-        locs, labels = pyplot.xticks()
-        pyplot.legend()
-        # pyplot.xticks(locs, ['', '0', '20', '40', '60', '80', '100', '120', '140', ''])
-        pyplot.xlabel('Arrival time [h]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.savefig(figures_dir +"fitting-pdf-starttime-beta.pdf", bbox_inches = "tight")
-
-
+        self.density_plot(folder, "pdf-starttime.pdf", startTimes, 'Arrival time [h]', xticks = plots.hourTicks)
+        # plot fitiing pdf norm and beta
+        figures.submit(folder, "fitting-pdf-starttime-norm.pdf", plots.norm_fit, startTimes, 'Arrival time [h]')
+        figures.submit(folder, "fitting-pdf-starttime-beta.pdf", plots.beta_fit, startTimes, 'Arrival time [h]')
         #FIXME only consider HH:MM and disregards dates. Want the distribution as a function of time during the day
-        pyplot.figure("cdf-starttime-hour")
-        pyplot.rcParams['font.size'] = '16'
-        ecdf = ECDF(data['start_datetime_hours'])
-        pyplot.plot(ecdf.x, ecdf.y, label='CDF')
-        pyplot.xlabel('Arrival time [h]')
-        pyplot.ylabel('Probability')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.legend()
-        pyplot.savefig(figures_dir +"cdf-starttime-hour.pdf",bbox_inches = "tight")
-
+        figures.submit(folder, "cdf-starttime-hour.pdf", plots.cdf, startTimes, 'Arrival time [h]', xticks = plots.hourTicks)
 
     def start_time_stats(self, carStats = None, percentiles = None):
-        data = self.data
-        
         #we start analyzing data per unique car, identified by their card ID. 
-        #dataframe with all unique card ids in the dataset
-        cardIDs = pd.unique(self.data['card_id'])
-        
-        #placeholder for data we will generate per car. First column will be the card_ids as unique identifier.
-        if carStats is not None:
-            print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object. Note that in the current configuation the column card_id is being redefined. Make sure that the data inputted in the function is the same as when the carStats object was created to prevent faulty bookkeeping.')
-        else:
-            carStats = pd.DataFrame()
-        
-        #FIXME check if input carStats non-empty whether need to append. Now assuming that all functions get the same data input
-        carStats['card_id'] = cardIDs
+        carStats = self.car_stats(carStats)
 
         #get all statistical data with respect to "variable under analysis" per individual car and put them in carStats dataframe
-        #for easy conversion, we first save the output of pd.dataframe.describe() per car in the row of a numpy array
-        statsMatrix = np.empty([0,8])
-
-        #per car, generate .describe() stats on data in seconds
-        for car in carStats['card_id']:
-            statsMatrix = np.vstack([statsMatrix, data[data['card_id'] == car].describe()['start_datetime_seconds'].to_numpy()])
-        #statsMatrix might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
-        start_time_Stats = pd.DataFrame(data = statsMatrix, index = None, columns = ['count', 'start_time_mean', 'start_time_std', 'start_time_min', 'start_time_25', 'start_time_50', 'start_time_75', 'start_time_max'])
-        #add stats columns to dataframe carStats
-        carStats = pd.concat([carStats,start_time_Stats], axis=1)
-
-        # Have to remove duplicated count column 
-        carStats = carStats.loc[:,~carStats.columns.duplicated()]
+        #the .describe() stats of all cars are computed at once, see car_description()
+        #stats might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
+        self.add_description(carStats, 'start_time')
 
         #create empirical cumulative distribution function per car based on start times.
-        statsList = []
-        for car in carStats['card_id']:
-            statsList = statsList + [ECDF(data[data['card_id'] == car]['start_datetime_hours'])]
-        carStats['start_time_ecdf'] = statsList
+        self.car_ecdfs('start_time', 'start_datetime_hours')
 
         #for parameter sweep, we hold open the option to add percentiles of the data
         if percentiles is not None:
-            percentileMatrix = np.empty([0,len(percentiles)])
-            #checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
-            for car in carStats['card_id']:
-                percentileMatrix = np.vstack([percentileMatrix, np.percentile(data[data['card_id'] ==car]['start_datetime_seconds'], percentiles)])
+            #all percentiles of all cars at once, see car_percentiles(). Checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
+            percentileMatrix = self.car_percentiles('start_datetime_seconds', percentiles)
             headers = []
             for i in range(0,len(percentiles)):
                 headers = headers + ['s{}'.format(percentiles[i])]
-            start_percentiles = pd.DataFrame(data = percentileMatrix, index = None, columns = headers)
-            carStats = pd.concat([carStats,start_percentiles],axis=1)
+            carStats.add('start_time_percentiles', pd.DataFrame(data = percentileMatrix, index = None, columns = headers), self.car_description()['card_id'])
 
         return carStats
 
@@ -399,97 +323,31 @@ class StatisticalAnalysis:
     """
 
     def end_time_plots(self):
-        data = self.data
         folder = "End_time/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
+        figures = self.figures
+        endTimes = column(self.data, 'end_datetime_hours').to_numpy()
 
         # plot boxes diagram
-        pyplot.figure("box_endtime")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.boxplot(data['end_datetime_hours'], vert = False)
-        pyplot.xlabel('Departure time [h]')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"box_endtime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("box_endtime"))
-
+        figures.submit(folder, "box_endtime.pdf", plots.box, endTimes, 'Departure time [h]', xticks = plots.hourTicks)
         #plot histogramm
-        pyplot.figure("Histogram_endtime")
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['end_datetime_hours'],bins = 100)
-        pyplot.xlabel('Departure time [h]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations. 
-        pyplot.savefig(figures_dir +"Histogram_endtime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("Histogram_endtime"))
-
-        
+        figures.submit(folder, "Histogram_endtime.pdf", plots.histogram, endTimes, 'Departure time [h]', xticks = plots.hourTicks)
         #plot probability density function
-        mean = data['end_datetime_hours'].mean()
-        std = data['end_datetime_hours'].std()
-
-        pyplot.figure("pdf-endtime")
-        pyplot.rcParams['font.size'] = '16'
-        a = (data['end_datetime_hours']).plot.kde()
-        pyplot.axvline(x=mean, color='r', ls='--', label='mean')
-        pyplot.axvline(x=mean-std, color='b', ls='--', label='std(+/-)')
-        pyplot.axvline(x=mean+std, color='b', ls='--')
-        pyplot.legend()
-        pyplot.xlabel('Departure time [h]')
-        pyplot.ylabel('Density')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"pdf-endtime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("pdf-endtime"))
-        
-
+        self.density_plot(folder, "pdf-endtime.pdf", endTimes, 'Departure time [h]', xticks = plots.hourTicks)
         #FIXME only consider HH:MM and disregards dates. Want the distribution as a function of time during the day
-        pyplot.figure("cdf-endtime-hour")
-        pyplot.rcParams['font.size'] = '16'
-        ecdf = ECDF(data['end_datetime_hours'])
-        pyplot.plot(ecdf.x, ecdf.y, label='CDF')
-        pyplot.xlabel('Departure time [h]')
-        pyplot.ylabel('Probability')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.legend()
-        pyplot.savefig(figures_dir +"cdf-endtime-hour.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("cdf-endtime-hour"))
+        figures.submit(folder, "cdf-endtime-hour.pdf", plots.cdf, endTimes, 'Departure time [h]', xticks = plots.hourTicks)
 
     def end_time_stats(self, carStats = None):
-        data = self.data
-
         #we start analyzing data per unique car, identified by their card ID. 
-        #dataframe with all unique card ids in the dataset
-        cardIDs = pd.unique(self.data['card_id'])
-
-        #placeholder for data we will generate per car. First column will be the card_ids as unique identifier.
-        if carStats is not None:
-            print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object. Note that in the current configuation the column card_id is being redefined. Make sure that the data inputted in the function is the same as when the carStats object was created to prevent faulty bookkeeping.')
-        else:
-            carStats = pd.DataFrame()
-        #FIXME check if input carStats non-empty whether need to append. Now assuming that all functions get the same data input
-        carStats['card_id'] = cardIDs
-
-        #get all statistical data with respect to starting time per individual car and put them in carStats dataframe
-        #for easy conversion, we first save the output of pd.dataframe.describe() per car in the row of a numpy array
-        statsMatrix = np.empty([0,8])
-        #per car, generate .describe() stats on data in seconds
-        for car in carStats['card_id']:
-            statsMatrix = np.vstack([statsMatrix, data[data['card_id'] == car].describe()['end_datetime_seconds'].to_numpy()])
-        #statsMatrix might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
-        end_time_Stats = pd.DataFrame(data = statsMatrix, index = None, columns = ['count', 'end_time_mean', 'end_time_std', 'end_time_min', 'end_time_25', 'end_time_50', 'end_time_75', 'end_time_max'])
-        #add stats columns to dataframe carStats
-        carStats = pd.concat([carStats,end_time_Stats], axis=1)
-
-        # Have to remove duplicated count column 
-        carStats = carStats.loc[:,~carStats.columns.duplicated()]
+        carStats = self.car_stats(carStats)
+
+        #get all statistical data with respect to "variable under analysis" per individual car and put them in carStats dataframe
+        #the .describe() stats of all cars are computed at once, see car_description()
+        #stats might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
+        self.add_description(carStats, 'end_time')
 
         #create empirical cumulative distribution function per car based on total energy.
         #this approach does not work with end times, since datetime objects cannot be compared to integers using ">".
-        statsList = []
-        for car in carStats['card_id']:
-            statsList = statsList + [ECDF(data[data['card_id'] == car]['end_datetime_hours'])]
-        carStats['end_time_ecdf'] = statsList
+        self.car_ecdfs('end_time', 'end_datetime_hours')
 
         return carStats
 
@@ -500,130 +358,53 @@ class StatisticalAnalysis:
     """
 
     def dwell_time_plots(self):
-        data = self.data
-
         folder = "Dwell_time/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
-        
+        figures = self.figures
+        dwellTimes = column(self.data, 'dwell_time_hours').to_numpy()
 
         # plot boxes diagram
-        pyplot.figure("box_dwelltime")
-        #pyplot.tight_layout()
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.boxplot(data['dwell_time_hours'], vert = False)
-        pyplot.xlabel('Dwell time [h]')
-        pyplot.xticks(np.arange(0, 28, 4),size=16)  # Set label locations.
-        pyplot.savefig(figures_dir +"box_dwelltime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("box_dwelltime"))
-
+        figures.submit(folder, "box_dwelltime.pdf", plots.box, dwellTimes, 'Dwell time [h]', xticks = plots.hourTicks)
         #plot histogramm
-        pyplot.figure("Histogram_dwelltime")
-        #pyplot.tight_layout()
-        pyplot.rcParams['font.size'] = '16'
-        pyplot.hist(data['dwell_time_hours'],bins = 100)
-        pyplot.xlabel('Dwell time [h]')
-        pyplot.ylabel('Number of sessions')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"Histogram_dwelltime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("Histogram_dwelltime"))
-
+        figures.submit(folder, "Histogram_dwelltime.pdf", plots.histogram, dwellTimes, 'Dwell time [h]', xticks = plots.hourTicks)
         #plot probability density function
-        mean = data['dwell_time_hours'].mean()
-        std = data['dwell_time_hours'].std()
-
-
-        pyplot.figure("pdf-dwelltime")
-        pyplot.rcParams['font.size'] = '16'
-        a = (data['dwell_time_hours']).plot.kde()
-        pyplot.axvline(x=mean, color='r', ls='--', label='mean')
-        pyplot.axvline(x=mean-std, color='b', ls='--', label='std(+/-)')
-        pyplot.axvline(x=mean+std, color='b', ls='--')
-        pyplot.legend()
-        pyplot.xlabel('Dwell time [h]')
-        pyplot.ylabel('Density')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"pdf-dwelltime.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("pdf-dwelltime"))
-        
-
+        self.density_plot(folder, "pdf-dwelltime.pdf", dwellTimes, 'Dwell time [h]', xticks = plots.hourTicks)
         #FIXME only consider HH:MM and disregards dates. Want the distribution as a function of time during the day
-        pyplot.figure("cdf-dwelltime-hour")
-        pyplot.rcParams['font.size'] = '16'
-        ecdf = ECDF(data['dwell_time_hours'])
-        pyplot.plot(ecdf.x, ecdf.y, label='CDF')
-        pyplot.legend()
-        pyplot.xlabel('Dwell time [h]')
-        pyplot.ylabel('Probability')
-        pyplot.xticks(np.arange(0, 28, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"cdf-dwelltime-hour.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("cdf-dwelltime-hour"))
+        figures.submit(folder, "cdf-dwelltime-hour.pdf", plots.cdf, dwellTimes, 'Dwell time [h]', xticks = plots.hourTicks)
         
     def dwell_time_stats(self, carStats = None, dwell = 1800, percentiles = None):
-        data = self.data
-
         #we start analyzing data per unique car, identified by their card ID. 
-        #dataframe with all unique card ids in the dataset
-        cardIDs = pd.unique(self.data['card_id'])
-
-        #placeholder for data we will generate per car. First column will be the card_ids as unique identifier.
-        if carStats is not None:
-            print('[MESSAGE:] No new carStats object was created. Augmented the input carStats object. Note that in the current configuation the column card_id is being redefined. Make sure that the data inputted in the function is the same as when the carStats object was created to prevent faulty bookkeeping.')
-        else:
-            carStats = pd.DataFrame()
-        #FIXME check if input carStats non-empty whether need to append. Now assuming that all functions get the same data input
-        carStats['card_id'] = cardIDs
-
-        #get all statistical data with respect to starting time per individual car and put them in carStats dataframe
-        #for easy conversion, we first save the output of pd.dataframe.describe() per car in the row of a numpy array
-        statsMatrix = np.empty([0,8])
-        #per car, generate .describe() stats
-        for car in carStats['card_id']:
-            statsMatrix = np.vstack([statsMatrix, data[data['card_id'] == car].describe()['dwell_time_seconds'].to_numpy()])
-        #statsMatrix might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
-        dwell_time_Stats = pd.DataFrame(data = statsMatrix, index = None, columns = ['count', 'dwell_time_mean', 'dwell_time_std', 'dwell_time_min', 'dwell_time_25', 'dwell_time_50', 'dwell_time_75', 'dwell_time_max'])
-        #add stats columns to dataframe carStats
-        carStats = pd.concat([carStats,dwell_time_Stats], axis=1)
-
-        # Have to remove duplicated count column 
-        carStats = carStats.loc[:,~carStats.columns.duplicated()]
+        carStats = self.car_stats(carStats)
+
+        #get all statistical data with respect to "variable under analysis" per individual car and put them in carStats dataframe
+        #the .describe() stats of all cars are computed at once, see car_description()
+        #stats might have empty entries: if only one occurence (only one charging session with that card_id), then std is not well-defined
+        self.add_description(carStats, 'dwell_time')
 
         #create empirical cumulative distribution function per car based on dwell times.
-        statsList = []
-        for car in carStats['card_id']:
-            statsList = statsList + [ECDF(data[data['card_id'] == car]['dwell_time_hours'])]
-        carStats['dwell_time_ecdf'] = statsList
+        self.car_ecdfs('dwell_time', 'dwell_time_hours')
 
 
         #based on dwell and start time stats, we create 'logical' end times. This only works if prior to dwell time stats, start time stats were generated.
-        for aspect in itertools.product(['mean', 'max', 'min', '75', '50', '25'],['mean', 'max', 'min', '75', '50', '25']):
-            #To prevent errors due to start and end times of a session being less than 15 minutes apart, or within the same 15 min interval, we enforce a minimum duration of 30 minutes
-            carStats['dwell_time_{}Enforced'.format(aspect[1])] = carStats['dwell_time_{}'.format(aspect[1])]
-            carStats.loc[carStats['dwell_time_{}'.format(aspect[1])] < dwell, 'dwell_time_{}Enforced'.format(aspect[1])] = dwell
-
-            #calculate new end time 
-            carStats['end_s{}_d{}'.format(aspect[0],aspect[1])] = carStats['start_time_{}'.format(aspect[0])] + carStats['dwell_time_{}Enforced'.format(aspect[1])]
+        #the end times of all combinations are kept in self.endTimes instead of carStats, e.g. self.endTimes.values('end_smean_dmean'), see end_time_grid.py
+        aspects = ['mean', 'max', 'min', '75', '50', '25']
+        self.endTimes = EndTimeGrid(carStats['card_id'], dwell)
+        self.endTimes.add({aspect: carStats['start_time_{}'.format(aspect)] for aspect in aspects},
+                          {aspect: carStats['dwell_time_{}'.format(aspect)] for aspect in aspects},
+                          keyFormat = 'end_s{}_d{}', enforcedFormat = 'dwell_time_{}Enforced')
         
         #for parameter sweep, we hold open the option to add percentiles of the data
         if percentiles is not None:
-            percentileMatrix = np.empty([0,len(percentiles)])
-            #checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
-            for car in carStats['card_id']:
-                percentileMatrix = np.vstack([percentileMatrix, np.percentile(data[data['card_id'] ==car]['dwell_time_seconds'], percentiles)])
+            #all percentiles of all cars at once, see car_percentiles(). Checked percentiles against min and max values. percentile 0 = min, percentile 100 = max ok.
+            percentileMatrix = self.car_percentiles('dwell_time_seconds', percentiles)
             headers = []
             for i in range(0,len(percentiles)):
                 headers = headers + ['d{}'.format(percentiles[i])]
-            start_percentiles = pd.DataFrame(data = percentileMatrix, index = None, columns = headers)
-            carStats = pd.concat([carStats,start_percentiles],axis=1)
+            carStats.add('dwell_time_percentiles', pd.DataFrame(data = percentileMatrix, index = None, columns = headers), self.car_description()['card_id'])
         
-            for aspect in itertools.product(percentiles, percentiles):
-                #To prevent errors due to start and end times of a session being less than 15 minutes apart, or within the same 15 min interval, we enforce a minimum duration of 30 minutes
-                carStats['d{}Enforced'.format(aspect[1])] = carStats['d{}'.format(aspect[1])]
-                carStats.loc[carStats['d{}'.format(aspect[1])] < dwell, 'd{}Enforced'.format(aspect[1])] = dwell
-
-                #calculate new end time 
-                carStats['end_s{}d{}'.format(aspect[0],aspect[1])] = carStats['s{}'.format(aspect[0])] + carStats['d{}Enforced'.format(aspect[1])]
+            #end times for all combinations of start and dwell percentiles, keys end_s<start percentile>d<dwell percentile>
+            self.endTimes.add({p: carStats['s{}'.format(p)] for p in percentiles},
+                              {p: carStats['d{}'.format(p)] for p in percentiles},
+                              keyFormat = 'end_s{}d{}', enforcedFormat = 'd{}Enforced')
                 
         return carStats
 
@@ -635,40 +416,20 @@ class StatisticalAnalysis:
     def correlation(self):
         data = self.data
         column_names = ['total_energy', 'start_datetime_hours', 'end_datetime_hours', 'dwell_time_hours']
-        folder = "Correlation/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
 
         # calculate correlation among parameters
-        corr = data[column_names].corr()
+        corr = pd.concat([column(data, name) for name in column_names], axis=1).corr()
 
         print(corr)
 
-
         #plot correlation
-        pyplot.figure("correlation", figsize=(12,10))
-        pyplot.rcParams['font.size'] = '16'
-        sns.heatmap(corr, cmap='viridis_r')
-        #pyplot.matshow(corr, cmap='RdBu')
-        pyplot.xticks(np.arange(0, len(column_names), 1)+0.5, ['Total energy', 'Arrival time', 'Departure time', 'Dwell time'],rotation=30)
-        pyplot.yticks(np.arange(0, len(column_names), 1)+0.5, ['Total energy', 'Arrival time', 'Departure time', 'Dwell time'],rotation=45)
-
-        #pyplot.ylabel('Number of sessions')
-        #pyplot.xticks(rotation=0)
-        #pyplot.yticks(rotation=90)
-        pyplot.savefig(figures_dir +"correlation.pdf", bbox_inches = "tight")
-        pyplot.close(pyplot.figure("correlation"))
-
-
-
-
-
+        self.figures.submit("Correlation/", "correlation.pdf", plots.correlation, corr, ['Total energy', 'Arrival time', 'Departure time', 'Dwell time'], figsize = (12, 10))
 
     """"
     ========================== Individual statistical analysis (EV with most charging sessions)=========================
     """
     def stats_per_car(self, carStats):
+        carStats = carStats.frame() if isinstance(carStats, CarStats) else carStats
         # Sorting cars with most charging sessions (high to low)
         carStats2 = carStats.sort_values(by="count", ascending=False)
                
@@ -677,136 +438,12 @@ class StatisticalAnalysis:
         print(carStats2)
 
         folder = "Per_Car/"
-        figures_dir = os.path.join('Figures/',folder)
-        if not os.path.isdir(figures_dir):
-            os.makedirs(figures_dir)
-
-        # ================================================================================================================================================
-        #plot energy+percentiles (10 cars wieth more charging sessions)
-        pyplot.figure("energy-percentiles-10-cars")
-        pyplot.rcParams['font.size'] = '16'
-        y=carStats2["energy_mean"]/1000
-        x=np.arange(0,len(carStats2["card_id"]))
-        pyplot.plot(x, y, color='r', label='Mean')
-        locs2, labels2 = pyplot.xticks()
-
-        y=carStats2["energy_max"]/1000
-        y2=carStats2["energy_75"]/1000
-        y3=carStats2["energy_50"]/1000
-        y4=carStats2["energy_25"]/1000
-        y5=carStats2["energy_min"]/1000
-
-        pyplot.fill_between(x, y, color='gray', alpha=0.3, label='Max')
-        pyplot.fill_between(x, y2, color='gray', alpha=0.4, label='75%')
-        pyplot.fill_between(x, y3, color='gray', alpha=0.6, label='50%')
-        pyplot.fill_between(x, y4, color='gray', alpha=0.8, label='25%')
-        pyplot.fill_between(x, y5, color='black', alpha=0.2, label='Min')
-        pyplot.legend(loc='upper right',fancybox=True, framealpha=0.5, fontsize=10)
-
-        pyplot.ylabel('Energy demand [kWh]')
-
-        pyplot.xticks(x, ['EV1', 'EV2', 'EV3', 'EV4', 'EV5', 'EV6', 'EV7', 'EV8', 'EV9', 'EV10'])
-        pyplot.xticks(rotation='vertical')
-        pyplot.savefig(figures_dir +"energy-percentiles-10-cars.pdf", bbox_inches = "tight")
-
-
-        # ================================================================================================================================================
-        #plot starttime+percentiles (10 cars wieth more charging sessions)
-        pyplot.figure("starttime-percentiles-10-cars")
-        pyplot.rcParams['font.size'] = '16'
-        x = carStats2["card_id"]
-        y = carStats2["start_time_mean"]/3600
-        
-        pyplot.plot(x, y, color='r',label='Mean')
-        locs2, labels2 = pyplot.xticks()
-
-        x=np.arange(0,len(carStats2["card_id"]))
-
-        y=carStats2["start_time_max"]/3600
-        y2=carStats2["start_time_75"]/3600
-        y3=carStats2["start_time_50"]/3600
-        y4=carStats2["start_time_25"]/3600
-        y5=carStats2["start_time_min"]/3600
-
-        pyplot.fill_between(x, y, color='gray', alpha=0.3, label='Max')
-        pyplot.fill_between(x, y2, color='gray', alpha=0.4, label='75%')
-        pyplot.fill_between(x, y3, color='gray', alpha=0.6, label='50%')
-        pyplot.fill_between(x, y4, color='gray', alpha=0.8, label='25%')
-        pyplot.fill_between(x, y5, color='black', alpha=0.2, label='Min')
-        pyplot.legend(loc='upper right', fancybox=True, framealpha=0.5, fontsize=10)
-
-        pyplot.ylabel('Arrival time [h]')
-
-        pyplot.xticks(x, ['EV1', 'EV2', 'EV3', 'EV4', 'EV5', 'EV6', 'EV7', 'EV8', 'EV9', 'EV10'])
-        pyplot.xticks(rotation='vertical')
-        pyplot.yticks(np.arange(0, 26, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"starttime-percentiles-10-cars.pdf", bbox_inches = "tight")
-
-
-        
-        # ================================================================================================================================================
-        #plot starttime+percentiles (10 cars wieth more charging sessions)
-        pyplot.figure("endtime-percentiles-10-cars")
-        pyplot.rcParams['font.size'] = '16'
-        x = carStats2["card_id"]
-        y = carStats2["end_time_mean"]/3600
-        
-        pyplot.plot(x, y, color='r', label='Mean')
-        locs2, labels2 = pyplot.xticks()
-
-        x=np.arange(0,len(carStats2["card_id"]))
-
-        y=carStats2["end_time_max"]/3600
-        y2=carStats2["end_time_75"]/3600
-        y3=carStats2["end_time_50"]/3600
-        y4=carStats2["end_time_25"]/3600
-        y5=carStats2["end_time_min"]/3600
-
-        pyplot.fill_between(x, y, color='gray', alpha=0.3, label='Max')
-        pyplot.fill_between(x, y2, color='gray', alpha=0.4, label='75%')
-        pyplot.fill_between(x, y3, color='gray', alpha=0.6, label='50%')
-        pyplot.fill_between(x, y4, color='gray', alpha=0.8, label='25%')
-        pyplot.fill_between(x, y5, color='black', alpha=0.2, label='Min')
-        pyplot.legend(loc='upper right', fancybox=True, framealpha=0.5, fontsize=10)
-
-        pyplot.ylabel('Departure time [h]')
-
-        pyplot.xticks(x, ['EV1', 'EV2', 'EV3', 'EV4', 'EV5', 'EV6', 'EV7', 'EV8', 'EV9', 'EV10'])
-        pyplot.xticks(rotation='vertical')
-        pyplot.yticks(np.arange(0, 26, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"endtime-percentiles-10-cars.pdf", bbox_inches = "tight")
-
-
-        # ================================================================================================================================================
-        #plot starttime+percentiles (10 cars wieth more charging sessions)
-        pyplot.figure("dwelltime-percentiles-10-cars")
-        pyplot.rcParams['font.size'] = '16'
-        x = carStats2["card_id"]
-        y = carStats2["dwell_time_mean"]/3600
-        
-        pyplot.plot(x, y, color='r', label='Mean')
-        locs2, labels2 = pyplot.xticks()
-
-        x=np.arange(0,len(carStats2["card_id"]))
-
-        y=carStats2["dwell_time_max"]/3600
-        y2=carStats2["dwell_time_75"]/3600
-        y3=carStats2["dwell_time_50"]/3600
-        y4=carStats2["dwell_time_25"]/3600
-        y5=carStats2["dwell_time_min"]/3600
-
-        pyplot.fill_between(x, y, color='gray', alpha=0.3, label='Max')
-        pyplot.fill_between(x, y2, color='gray', alpha=0.4, label='75%')
-        pyplot.fill_between(x, y3, color='gray', alpha=0.6, label='50%')
-        pyplot.fill_between(x, y4, color='gray', alpha=0.8, label='25%')
-        pyplot.fill_between(x, y5, color='black', alpha=0.2, label='Min')
-        pyplot.legend(loc='upper right', fancybox=True, framealpha=0.5, fontsize=10)
-
-        pyplot.ylabel('Dwell time [h]')
-
-        pyplot.xticks(x, ['EV1', 'EV2', 'EV3', 'EV4', 'EV5', 'EV6', 'EV7', 'EV8', 'EV9', 'EV10'])
-        pyplot.xticks(rotation='vertical')
-        pyplot.yticks(np.arange(0, 20, 4))  # Set label locations.
-        pyplot.savefig(figures_dir +"dwelltime-percentiles-10-cars.pdf", bbox_inches = "tight")
+        #plot energy, start, end and dwell time + percentiles (10 cars with most charging sessions)
+        for prefix, name, scale, ylabel, yticks in [('energy', 'energy', 1000, 'Energy demand [kWh]', None),
+                                                    ('start_time', 'starttime', 3600, 'Arrival time [h]', np.arange(0, 26, 4)),
+                                                    ('end_time', 'endtime', 3600, 'Departure time [h]', np.arange(0, 26, 4)),
+                                                    ('dwell_time', 'dwelltime', 3600, 'Dwell time [h]', np.arange(0, 20, 4))]:
+            stats = pd.DataFrame({statistic: carStats2['{}_{}'.format(prefix, statistic)].to_numpy()/scale for statistic in ['mean', 'min', '25', '50', '75', 'max']})
+            self.figures.submit(folder, "{}-percentiles-10-cars.pdf".format(name), plots.percentile_bands, stats, ylabel, yticks = yticks)
 
         return carStats2
\ No newline at end of file
@@ -0,0 +1,49 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+import pandas as pd
+
+""""
+========================== Timestamp Normalization =========================
+"""
+
+# class to convert the timestamps of the charging session exports to local (wall clock) time.
+# All conversions are vectorized and use the tz database, so daylight saving time is handled for any year.
+# The output is timezone-naive local time, which is what the rest of the analysis (hours since midnight etc.) works with.
+# Always in nanoseconds, whether the input was parsed from strings or already typed by the csv parser, such that all tables have the same schema.
+class TimestampNormalizer:
+    def __init__(self, timezone = 'Europe/Amsterdam'):
+        self.timezone = timezone
+
+    #dates have type string and format YYYY-MM-DDTHH:MM:SSZ, i.e. utc.
+    def from_utc(self, timestamps, format = '%Y-%m-%dT%H:%M:%SZ'):
+        utc = pd.to_datetime(timestamps, format = format, utc = True).dt.as_unit('ns')
+        return utc.dt.tz_convert(self.timezone).dt.tz_localize(None)
+
+    #dates have type string and format YYYY-MM-DD HH:MM:SS+ZZ:ZZ, i.e. local time including the utc offset.
+    #returns the local time and the utc offset (as timedelta) of each timestamp.
+    def from_offset(self, timestamps, format = '%Y-%m-%d %H:%M:%S%z'):
+        utc = pd.to_datetime(timestamps, format = format, utc = True).dt.as_unit('ns')
+        local = utc.dt.tz_convert(self.timezone).dt.tz_localize(None)
+        offset = local - utc.dt.tz_localize(None)
+        return local, offset
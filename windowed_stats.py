@@ -0,0 +1,158 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import numpy as np
+import pandas as pd
+from filter_data_process import column
+from car_stats import CarStats
+
+""""
+========================== Windowed Statistics =========================
+"""
+
+# class to estimate the statistics per car from recent sessions only, since commuting patterns drift.
+# Windows: the last lastSessions sessions, the sessions of the last lastWeeks weeks, or all sessions with exponentially decaying weights (halfLife, e.g. '4W' or pd.Timedelta).
+# The sessions of every car are kept sorted by start time in one array per variable. advance(end) moves the window to all sessions that started before end,
+# and only recomputes the cars whose window changed, i.e. that charged since the previous end (or whose oldest session dropped out of the last weeks).
+# With decaying weights, moving forward scales all weights of a car by the same factor, so cars without new sessions keep their statistics as well.
+class WindowedCarStats:
+    #as prefix in carStats -> session column, and the prefix of the percentile columns
+    variables = {'energy': 'total_energy_Wh',
+                 'start_time': 'start_datetime_seconds',
+                 'end_time': 'end_datetime_seconds',
+                 'dwell_time': 'dwell_time_seconds'}
+    percentileColumns = {'energy': 'e', 'start_time': 's', 'dwell_time': 'd'}
+    statistics = ['mean', 'std', 'min', '25', '50', '75', 'max']
+
+    def __init__(self, sessions, lastSessions = None, lastWeeks = None, halfLife = None, percentiles = None, timeColumn = 'start_datetime_utc'):
+        if sum(window is not None for window in [lastSessions, lastWeeks, halfLife]) != 1:
+            raise ValueError('Choose exactly one window: lastSessions, lastWeeks or halfLife')
+        self.lastSessions = lastSessions
+        self.lastWeeks = None if lastWeeks is None else np.timedelta64(pd.Timedelta(weeks = lastWeeks))
+        self.halfLife = None if halfLife is None else pd.Timedelta(halfLife) / pd.Timedelta(seconds = 1)
+        self.percentiles = [] if percentiles is None else list(percentiles)
+
+        #per car slices of the sessions, sorted by start time
+        codes, self.cardIDs = pd.factorize(sessions['card_id'], use_na_sentinel = False)
+        times = sessions[timeColumn].to_numpy(dtype = 'datetime64[ns]')
+        order = np.lexsort((times, codes))
+        self.times = times[order]
+        self.values = {prefix: column(sessions, name).to_numpy(dtype = float)[order] for prefix, name in self.variables.items()}
+        self.offsets = np.concatenate([[0], np.cumsum(np.bincount(codes, minlength = len(self.cardIDs)))])
+        #all sessions sorted by start time, to find the cars that charged between two points in time
+        timeOrder = np.argsort(times, kind = 'stable')
+        self.sortedTimes = times[timeOrder]
+        self.sortedCodes = codes[timeOrder]
+
+        #current window per car: sessions starts[car]:stops[car], and their statistics
+        self.end = None
+        self.starts = self.offsets[:-1].copy()
+        self.stops = self.offsets[:-1].copy()
+        self.counts = np.zeros(len(self.cardIDs))
+        self.stats = {prefix: np.full((len(self.cardIDs), len(self.statistics)), np.nan) for prefix in self.variables}
+        self.percentileStats = {prefix: np.full((len(self.cardIDs), len(self.percentiles)), np.nan) for prefix in self.percentileColumns}
+
+    #cars with a session starting in [start, end)
+    def cars_between(self, start, end):
+        return np.unique(self.sortedCodes[np.searchsorted(self.sortedTimes, start):np.searchsorted(self.sortedTimes, end)])
+
+    #move the window to the sessions that started before end. Returns the rows (in cardIDs) of the cars that were updated.
+    #Moving backwards is possible, but recomputes all cars.
+    def advance(self, end):
+        end = np.datetime64(pd.Timestamp(end), 'ns')
+        if self.end is None or end < self.end:
+            cars = np.arange(len(self.cardIDs))
+        else:
+            cars = self.cars_between(self.end, end)
+            if self.lastWeeks is not None:
+                cars = np.union1d(cars, self.cars_between(self.end - self.lastWeeks, end - self.lastWeeks))
+        self.end = end
+
+        for car in cars:
+            first, last = self.offsets[car], self.offsets[car + 1]
+            self.stops[car] = first + np.searchsorted(self.times[first:last], end)
+            if self.lastSessions is not None:
+                self.starts[car] = max(first, self.stops[car] - self.lastSessions)
+            elif self.lastWeeks is not None:
+                self.starts[car] = first + np.searchsorted(self.times[first:last], end - self.lastWeeks)
+            else:
+                self.starts[car] = first
+            self.describe(car)
+        return cars
+
+    #statistics of the current window of a car
+    def describe(self, car):
+        window = slice(self.starts[car], self.stops[car])
+        self.counts[car] = window.stop - window.start
+        #ages in seconds, for the decaying weights
+        ages = (self.end - self.times[window]) / np.timedelta64(1, 's')
+        for prefix in self.variables:
+            values = self.values[prefix][window]
+            known = ~np.isnan(values)
+            values = values[known]
+            if len(values) == 0:
+                self.stats[prefix][car] = np.nan
+                if prefix in self.percentileStats:
+                    self.percentileStats[prefix][car] = np.nan
+                continue
+            weights = None if self.halfLife is None else 0.5**(ages[known]/self.halfLife)
+            fractions = np.array([0.25, 0.5, 0.75] + [p/100 for p in self.percentiles])
+            quantiles = self.quantiles(values, weights, fractions)
+            self.stats[prefix][car] = [np.average(values, weights = weights), self.std(values, weights), values.min(), quantiles[0], quantiles[1], quantiles[2], values.max()]
+            if prefix in self.percentileStats:
+                self.percentileStats[prefix][car] = quantiles[3:]
+
+    #sample standard deviation, as .describe(). With weights, the unbiased estimate for reliability weights.
+    @staticmethod
+    def std(values, weights = None):
+        if len(values) < 2:
+            return np.nan
+        if weights is None:
+            return values.std(ddof = 1)
+        mean = np.average(values, weights = weights)
+        total = weights.sum()
+        return np.sqrt((weights*(values - mean)**2).sum() / (total - (weights**2).sum()/total))
+
+    #linear interpolation as np.percentile. With weights, between the weighted midpoints of the sorted values.
+    @staticmethod
+    def quantiles(values, weights, fractions):
+        if weights is None:
+            return np.percentile(values, fractions*100)
+        order = np.argsort(values)
+        values, weights = values[order], weights[order]
+        midpoints = (np.cumsum(weights) - weights/2) / weights.sum()
+        return np.interp(fractions, midpoints, values)
+
+    #CarStats of the current window with the columns of the *_stats functions of StatisticalAnalysis. Cars without sessions in the window get count 0 and NaN.
+    def car_stats(self):
+        if self.end is None:
+            raise ValueError('Call advance(end) first')
+        cardIDs = list(self.cardIDs)
+        carStats = CarStats(cardIDs)
+        carStats.add('count', {'count': self.counts.copy()}, cardIDs)
+        for prefix in self.variables:
+            carStats.add(prefix, pd.DataFrame(self.stats[prefix], columns = ['{}_{}'.format(prefix, statistic) for statistic in self.statistics]), cardIDs)
+            if self.percentiles and prefix in self.percentileColumns:
+                carStats.add('{}_percentiles'.format(prefix), pd.DataFrame(self.percentileStats[prefix], columns = ['{}{}'.format(self.percentileColumns[prefix], p) for p in self.percentiles]), cardIDs)
+        return carStats
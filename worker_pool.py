@@ -0,0 +1,41 @@
+#    Data analysis in OfficeEVparkingLot
+#    Filter, process and analyze EV data collected at Dutch office building parking lot
+#    Statistical analysis of EV data at ASR facilities - GridShield project - developed by
+#    Leoni Winschermann, University of Twente, l.winschermann@utwente.nl
+#    Nataly Bañol Arias, University of Twente, m.n.banolarias@utwente.nl
+#
+#    Copyright (C) 2022 CAES and MOR Groups, University of Twente, Enschede, The Netherlands
+#
+#    This library is free software; you can redistribute it and/or
+#    modify it under the terms of the GNU Lesser General Public
+#    License as published by the Free Software Foundation; either
+#    version 2.1 of the License, or (at your option) any later version.
+#
+#    This library is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+#    Lesser General Public License for more details.
+#
+#    You should have received a copy of the GNU Lesser General Public
+#    License along with this library; if not, write to the Free Software
+#    Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301
+#    USA
+
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+""""
+========================== Worker Pool =========================
+"""
+
+# pools of worker processes for the parallel parts of the analysis (parsing the data files, rendering figures, fitting distributions).
+# Worker processes are always forked: spawned processes, the only option on Windows, would rerun the main script, which is not guarded by if __name__ == '__main__' in main.py.
+# Without fork, callers fall back to threads or run their jobs directly, see can_fork().
+
+def can_fork():
+    return 'fork' in multiprocessing.get_all_start_methods()
+
+#pool of workers forked from this process. Only call if can_fork().
+def fork_pool(workers = None):
+    return ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('fork'))